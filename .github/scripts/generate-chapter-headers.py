@@ -1,10 +1,34 @@
 #!/usr/bin/env python3
 """
 Generate chapter header images with baked-in text.
-Usage: python .github/scripts/generate-chapter-headers.py
+Usage: python .github/scripts/generate-chapter-headers.py [--batch FILE] [--force] [--jobs N]
+
+Headers whose title, font, background and layout settings are unchanged
+since the last run (as recorded in chapter-headers.manifest.json) are
+skipped; the rest are rendered in parallel. The manifest is gitignored: it
+describes the images and font on this machine, so a fresh checkout renders
+everything once and then only what changes.
+
+Without --batch the chapters in CHAPTERS get a chapter-header.png each.
+--batch reads a JSON list of headers to render instead, e.g.
+
+    [{"folder": "00-quick-start", "title": "Chapter 00: Quick Start",
+      "sizes": [[1280, 320], 640], "formats": ["png", "webp"]}]
+
+"sizes" holds [width, height] pairs or widths (height keeps the aspect
+ratio) and defaults to the background's size; "formats" defaults to
+["png"]; "name" defaults to "chapter-header". Each title is drawn once and
+then resized and encoded for every variant, written to
+FOLDER/images/NAME.EXT at full size, NAME-WxH.EXT for a [width, height]
+pair and NAME-Ww.EXT for a width.
 """
 
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 from PIL import Image, ImageDraw, ImageFont
+import argparse
+import hashlib
+import json
 import os
 import sys
 
@@ -24,14 +48,30 @@ CHAPTERS = {
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 PROJECT_ROOT = os.path.dirname(os.path.dirname(SCRIPT_DIR))
 BACKGROUND_IMAGE = os.path.join(PROJECT_ROOT, "images", "chapter-header-bg.png")
+MANIFEST_FILE = os.path.join(SCRIPT_DIR, "chapter-headers.manifest.json")
 
 # Font settings - 25% larger than original 36px
 FONT_SIZE = 45
 RIGHT_PADDING = 30
+# Minimum x position to avoid overlapping the copilot logo (logo is ~320px wide)
+MIN_X_POSITION = 350
+LINE_GAP = 5
+TEXT_COLOR = (255, 255, 255)
+
+# Pillow format name and save() options for each output format
+ENCODERS = {
+    "png": ("PNG", {"optimize": True}),
+    "webp": ("WEBP", {"quality": 90, "method": 6}),
+}
+DEFAULT_NAME = "chapter-header"
+
+# Set in each worker process by init_worker()
+_background = None
+_font = None
 
 
-def find_font():
-    """Find a suitable system font."""
+def find_font_path():
+    """Find a suitable system font, or None to use Pillow's default."""
     font_paths = [
         "/System/Library/Fonts/Helvetica.ttc",
         "/System/Library/Fonts/SFNSMono.ttf",
@@ -44,28 +84,101 @@ def find_font():
     for fp in font_paths:
         if os.path.exists(fp):
             try:
-                return ImageFont.truetype(fp, FONT_SIZE)
+                ImageFont.truetype(fp, FONT_SIZE)
+                return fp
             except Exception:
                 continue
 
     print("Warning: Using default font (may look different)")
-    return ImageFont.load_default()
+    return None
+
+
+def load_font(font_path):
+    if font_path is None:
+        return ImageFont.load_default()
+    return ImageFont.truetype(font_path, FONT_SIZE)
+
+
+def load_background():
+    """Decode the background image once; headers are drawn on copies of it."""
+    with Image.open(BACKGROUND_IMAGE) as bg:
+        return bg.convert("RGB")
+
+
+def file_digest(path):
+    if path is None:
+        return "default"
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def header_key(title, font_digest, background_digest, size=None, fmt="png"):
+    """Hash of everything that affects how a header looks."""
+    settings = {
+        "title": title,
+        "font": font_digest,
+        "background": background_digest,
+        "font_size": FONT_SIZE,
+        "right_padding": RIGHT_PADDING,
+        "min_x_position": MIN_X_POSITION,
+        "line_gap": LINE_GAP,
+        "text_color": TEXT_COLOR,
+        "size": size,
+        "encoder": ENCODERS[fmt],
+    }
+    return hashlib.sha256(json.dumps(settings, sort_keys=True).encode()).hexdigest()
+
+
+def load_manifest():
+    try:
+        with open(MANIFEST_FILE) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def save_manifest(manifest):
+    with open(MANIFEST_FILE, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def output_path_for(folder, name=DEFAULT_NAME, size=None, fmt="png"):
+    suffix = "" if size is None else "-{}x{}".format(*size) if isinstance(size, list) else f"-{size}w"
+    return os.path.join(PROJECT_ROOT, folder, "images", f"{name}{suffix}.{fmt}")
+
+
+def is_up_to_date(manifest, output_path, key):
+    """Whether the header on disk was rendered from the same inputs last run."""
+    entry = manifest.get(os.path.relpath(output_path, PROJECT_ROOT))
+    if not entry or entry.get("key") != key:
+        return False
+    return os.path.exists(output_path) and file_digest(output_path) == entry.get("output")
+
+
+@lru_cache(maxsize=None)
+def _measure_draw():
+    return ImageDraw.Draw(Image.new("RGB", (1, 1)))
+
 
+@lru_cache(maxsize=4096)
+def text_bbox(text, font):
+    """draw.textbbox() for text at the origin; the result doesn't depend on the image."""
+    return _measure_draw().textbbox((0, 0), text, font=font)
 
-def generate_header(chapter_folder, title, font):
-    """Generate a header image for a chapter."""
-    # Load background
-    bg = Image.open(BACKGROUND_IMAGE)
-    bg = bg.convert("RGB")
+
+def draw_header(title, font, background):
+    """Return a copy of background with title drawn on it."""
+    bg = background.copy()
     draw = ImageDraw.Draw(bg)
 
     width, height = bg.size
 
-    # Minimum x position to avoid overlapping the copilot logo (logo is ~320px wide)
-    MIN_X_POSITION = 350
-
     # Calculate text width for full title
-    bbox = draw.textbbox((0, 0), title, font=font)
+    bbox = text_bbox(title, font)
     text_width = bbox[2] - bbox[0]
     text_height = bbox[3] - bbox[1]
 
@@ -85,15 +198,15 @@ def generate_header(chapter_folder, title, font):
             line2 = " ".join(words[mid:])
 
         # Calculate dimensions for both lines
-        bbox1 = draw.textbbox((0, 0), line1, font=font)
-        bbox2 = draw.textbbox((0, 0), line2, font=font)
+        bbox1 = text_bbox(line1, font)
+        bbox2 = text_bbox(line2, font)
 
         line1_width = bbox1[2] - bbox1[0]
         line2_width = bbox2[2] - bbox2[0]
         line_height = bbox1[3] - bbox1[1]
 
         # Line spacing
-        line_gap = 5
+        line_gap = LINE_GAP
         total_height = line_height * 2 + line_gap
 
         # Right-align both lines
@@ -105,24 +218,90 @@ def generate_header(chapter_folder, title, font):
         y2 = y1 + line_height + line_gap
 
         # Draw both lines
-        draw.text((x1, y1), line1, fill=(255, 255, 255), font=font)
-        draw.text((x2, y2), line2, fill=(255, 255, 255), font=font)
+        draw.text((x1, y1), line1, fill=TEXT_COLOR, font=font)
+        draw.text((x2, y2), line2, fill=TEXT_COLOR, font=font)
     else:
         # Single line - fits fine
         y = (height - text_height) // 2
-        draw.text((x, y), title, fill=(255, 255, 255), font=font)
+        draw.text((x, y), title, fill=TEXT_COLOR, font=font)
 
-    # Save to chapter's images folder
-    output_dir = os.path.join(PROJECT_ROOT, chapter_folder, "images")
-    os.makedirs(output_dir, exist_ok=True)
+    return bg
 
-    output_path = os.path.join(output_dir, "chapter-header.png")
-    bg.save(output_path)
 
+def save_variant(image, output_path, size=None, fmt="png"):
+    """Resize image to size (a [width, height] pair or a width) and encode it as fmt."""
+    if size is not None:
+        if not isinstance(size, list):
+            size = [size, round(image.height * size / image.width)]
+        image = image.resize(tuple(size), Image.LANCZOS)
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    pil_format, options = ENCODERS[fmt]
+    image.save(output_path, pil_format, **options)
     return output_path
 
 
+def init_worker(mode, size, pixels, font_path):
+    """Rebuild the shared background and font once per worker process."""
+    global _background, _font
+    _background = Image.frombytes(mode, size, pixels)
+    _font = load_font(font_path)
+
+
+def render_job(job):
+    """Draw one title and write each of its (output_path, size, fmt) variants."""
+    title, variants = job
+    image = draw_header(title, _font, _background)
+    return [save_variant(image, *variant) for variant in variants]
+
+
+def load_batch(path):
+    """Read a batch file into (folder, title, [(output_path, size, fmt), ...]) entries."""
+    with open(path) as f:
+        entries = json.load(f)
+    if not isinstance(entries, list):
+        raise ValueError("batch file must hold a JSON list")
+    headers = []
+    for number, entry in enumerate(entries, start=1):
+        try:
+            folder, title = entry["folder"], entry["title"]
+            sizes = entry.get("sizes") or [None]
+            formats = entry.get("formats") or ["png"]
+            name = entry.get("name", DEFAULT_NAME)
+        except (KeyError, TypeError, AttributeError):
+            raise ValueError(f"entry {number} needs a folder and a title") from None
+        for fmt in formats:
+            if fmt not in ENCODERS:
+                raise ValueError(f"entry {number}: unknown format {fmt!r} (use {', '.join(ENCODERS)})")
+        for size in sizes:
+            valid = size is None or (isinstance(size, int) and size > 0) or (
+                isinstance(size, list) and len(size) == 2 and all(isinstance(n, int) and n > 0 for n in size))
+            if not valid:
+                raise ValueError(f"entry {number}: bad size {size!r}")
+        variants = [(output_path_for(folder, name, size, fmt), size, fmt) for size in sizes for fmt in formats]
+        headers.append((folder, title, variants))
+    return headers
+
+
+def chapter_headers():
+    """The CHAPTERS whose folders exist, as load_batch() entries."""
+    headers = []
+    for chapter_folder, title in CHAPTERS.items():
+        chapter_path = os.path.join(PROJECT_ROOT, chapter_folder)
+        if not os.path.exists(chapter_path):
+            print(f"  Skipping {chapter_folder} (folder not found)")
+            continue
+        headers.append((chapter_folder, title, [(output_path_for(chapter_folder), None, "png")]))
+    return headers
+
+
 def main():
+    parser = argparse.ArgumentParser(description="Generate chapter header images.")
+    parser.add_argument("--batch", metavar="FILE", help="JSON list of headers to render (see above)")
+    parser.add_argument("--force", action="store_true", help="regenerate every header")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1,
+                        help="worker processes to render with")
+    options = parser.parse_args()
+
     print("Generating chapter headers...")
     print(f"Background: {BACKGROUND_IMAGE}")
     print(f"Font size: {FONT_SIZE}px")
@@ -132,20 +311,58 @@ def main():
         print(f"Error: Background image not found: {BACKGROUND_IMAGE}")
         sys.exit(1)
 
-    font = find_font()
-
-    for chapter_folder, title in CHAPTERS.items():
-        chapter_path = os.path.join(PROJECT_ROOT, chapter_folder)
-        if not os.path.exists(chapter_path):
-            print(f"  Skipping {chapter_folder} (folder not found)")
-            continue
+    if options.batch:
+        try:
+            headers = load_batch(options.batch)
+        except (OSError, ValueError) as e:
+            print(f"Error: {options.batch}: {e}")
+            sys.exit(1)
+    else:
+        headers = chapter_headers()
+
+    font_path = find_font_path()
+    font_digest = file_digest(font_path)
+    background_digest = file_digest(BACKGROUND_IMAGE)
+    manifest = {} if options.force else load_manifest()
+
+    jobs = []
+    keys = {}
+    skipped = 0
+    for folder, title, variants in headers:
+        pending = []
+        for output_path, size, fmt in variants:
+            key = header_key(title, font_digest, background_digest, size, fmt)
+            if is_up_to_date(manifest, output_path, key):
+                skipped += 1
+                continue
+            keys[output_path] = key
+            pending.append((output_path, size, fmt))
+        if pending:
+            jobs.append((title, pending))
+        else:
+            print(f"  Skipping {folder} (unchanged)")
+
+    if jobs:
+        background = load_background()
+        init_args = (background.mode, background.size, background.tobytes(), font_path)
+        if options.jobs > 1 and len(jobs) > 1:
+            with ProcessPoolExecutor(min(options.jobs, len(jobs)), initializer=init_worker,
+                                     initargs=init_args) as pool:
+                results = list(pool.map(render_job, jobs))
+        else:
+            init_worker(*init_args)
+            results = [render_job(job) for job in jobs]
 
-        output_path = generate_header(chapter_folder, title, font)
-        print(f"  {title}")
-        print(f"    -> {os.path.relpath(output_path, PROJECT_ROOT)}")
+        for (title, _), output_paths in zip(jobs, results):
+            print(f"  {title}")
+            for output_path in output_paths:
+                relative = os.path.relpath(output_path, PROJECT_ROOT)
+                manifest[relative] = {"key": keys[output_path], "output": file_digest(output_path)}
+                print(f"    -> {relative}")
+        save_manifest(manifest)
 
     print()
-    print("Done! Headers generated for all chapters.")
+    print(f"Done! {len(keys)} image(s) generated, {skipped} unchanged.")
 
 
 if __name__ == "__main__":
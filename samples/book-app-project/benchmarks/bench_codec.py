@@ -0,0 +1,67 @@
+"""Compare snapshot encode/decode times for each codec against the original path.
+
+Usage: python benchmarks/bench_codec.py [--books 500000] [--runs 3]
+
+"baseline" is the original save_books/load_books code: json.dump of asdict()
+per book with indent=2, and Book(**b) per loaded dict.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from dataclasses import asdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from codec import CODECS, get_codec  # noqa: E402
+from models import Book  # noqa: E402
+from synthetic import make_books  # noqa: E402
+
+
+class BaselineCodec:
+    name = "baseline"
+
+    def encode(self, books):
+        return json.dumps([asdict(b) for b in books], indent=2).encode()
+
+    def decode(self, data):
+        return [Book(**b) for b in json.loads(data)]
+
+
+def best_of(runs, func, *args):
+    best = float("inf")
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--books", type=int, default=500_000)
+    parser.add_argument("--runs", type=int, default=3)
+    options = parser.parse_args()
+
+    books = make_books(options.books)
+    codecs = [BaselineCodec()]
+    for name in CODECS[1:]:
+        try:
+            codecs.append(get_codec(name))
+        except ValueError:
+            print(f"({name} not installed, skipped)")
+
+    print(f"{options.books:,} books, best of {options.runs} runs")
+    print(f"  {'codec':10} {'encode':>10} {'decode':>10} {'size':>10}")
+    for codec in codecs:
+        encode_time, data = best_of(options.runs, codec.encode, books)
+        decode_time, decoded = best_of(options.runs, codec.decode, data)
+        assert decoded == books
+        print(f"  {codec.name:10} {encode_time * 1000:8.0f}ms {decode_time * 1000:8.0f}ms "
+              f"{len(data) / 1e6:8.1f}MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Measure how long book_app.py takes to start for commands that do and don't need data.
+
+Usage: python benchmarks/bench_startup.py [--books 200000] [--runs 9] [--max-help-overhead-ms 50]
+
+`help` and unknown commands should not pay for parsing the collection, so
+their time should stay flat as --books grows. The same goes for reading a
+page of books from the memory-mapped binary snapshot (BOOKS_STORAGE=snapshot).
+
+Times are compared with two baselines measured on the same machine: a bare
+`python -c pass`, and `help` in a directory with no data at all. Exits
+non-zero when `help` costs more than --max-help-overhead-ms over the bare
+interpreter (i.e. it started importing storage backends again), or when it
+is slower with --books books than with none.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+
+from synthetic import make_books, write_json  # noqa: E402
+from storage import SnapshotStorage  # noqa: E402
+
+
+def time_command(cwd: str, args, runs: int, storage: str = "json", script: str = "book_app.py") -> float:
+    """Median wall time in milliseconds of running book_app.py (or python with script=None) with args."""
+    env = dict(os.environ, BOOKS_STORAGE=storage)
+    command = [sys.executable, *args] if script is None else [sys.executable, os.path.join(APP_DIR, script), *args]
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, cwd=cwd, env=env, stdout=subprocess.DEVNULL, check=True)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--books", type=int, default=200_000)
+    parser.add_argument("--runs", type=int, default=9)
+    parser.add_argument("--max-help-overhead-ms", type=float, default=50.0,
+                        help="how much slower than a bare interpreter `help` may be")
+    parser.add_argument("--tolerance-ms", type=float, default=10.0,
+                        help="noise allowed between `help` with and without data")
+    options = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as empty:
+        baselines = {
+            "python -c pass": time_command(empty, ["-c", "pass"], options.runs, script=None),
+            "help (no data)": time_command(empty, ["help"], options.runs),
+        }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        write_json(os.path.join(tmp, "data.json"), options.books)
+        SnapshotStorage(os.path.join(tmp, "books.snap")).save(make_books(options.books))
+        page = ["list", "--limit", "10", "--format", "jsonl"]
+        results = {
+            "help": time_command(tmp, ["help"], options.runs),
+            "unknown": time_command(tmp, ["nope"], options.runs),
+            "list": time_command(tmp, ["list"], options.runs),
+            "page": time_command(tmp, page, options.runs),
+            "page (snapshot)": time_command(tmp, page, options.runs, storage="snapshot"),
+            "list (snapshot)": time_command(tmp, ["list"], options.runs, storage="snapshot"),
+        }
+
+    print(f"book_app.py startup (median of {options.runs} runs)")
+    for command, ms in baselines.items():
+        print(f"  {command:16} {ms:8.1f} ms")
+    print(f"with {options.books:,} books")
+    for command, ms in results.items():
+        print(f"  {command:16} {ms:8.1f} ms")
+
+    overhead = results["help"] - baselines["python -c pass"]
+    failed = False
+    if overhead > options.max_help_overhead_ms:
+        print(f"FAIL: help costs {overhead:.1f} ms over a bare interpreter "
+              f"(limit {options.max_help_overhead_ms:.0f} ms)")
+        failed = True
+    if results["help"] > baselines["help (no data)"] + options.tolerance_ms:
+        print(f"FAIL: help is slower with {options.books:,} books than with none")
+        failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""Load-test server.py and report requests/sec and latency percentiles.
+
+Usage: python benchmarks/load_test.py [--url http://127.0.0.1:8080] [--books 100000]
+           [--connections 50] [--requests 20000] [--write-ratio 0.1] [--storage json]
+
+Without --url a server is started on a free port against a generated
+collection in the --storage backend (the default JSON file unless given),
+and stopped afterwards.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import quote, urlsplit
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+
+import books  # noqa: E402
+from storage import ChunkedStorage, migrate_json_to_snapshot, migrate_json_to_sqlite  # noqa: E402
+from synthetic import AUTHORS, make_books, write_json  # noqa: E402
+
+
+async def request(reader, writer, method: str, path: str, body: bytes = b""):
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: bench\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode().partition(":")
+        if name.lower() == "content-length":
+            length = int(value)
+    await reader.readexactly(length)
+    return status
+
+
+async def worker(host, port, books, remaining, write_ratio, latencies, errors, rng):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while remaining[0] > 0:
+            remaining[0] -= 1
+            roll = rng.random()
+            if roll < write_ratio:
+                body = json.dumps({"title": f"Load {rng.getrandbits(64):x}", "author": "Load Test", "year": 2024})
+                args = ("POST", "/books", body.encode())
+            elif roll < (1 + write_ratio) / 2:
+                args = ("GET", "/books/" + quote(f"Book {rng.randrange(books):07d}"))
+            else:
+                args = ("GET", "/books?author=" + quote(f"Author {rng.randrange(AUTHORS):04d}"))
+            start = time.perf_counter()
+            status = await request(reader, writer, *args)
+            latencies.append(time.perf_counter() - start)
+            if status >= 400:
+                errors.append(status)
+    finally:
+        writer.close()
+
+
+async def run_load(host, port, options):
+    latencies, errors = [], []
+    remaining = [options.requests]
+    rng = random.Random(0)
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        worker(host, port, options.books, remaining, options.write_ratio, latencies, errors,
+               random.Random(rng.random()))
+        for _ in range(options.connections)
+    ))
+    return time.perf_counter() - start, latencies, errors
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for_port(port: int, timeout: float = 120):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise TimeoutError(f"server did not start on port {port}")
+
+
+def seed(directory: str, kind: str, count: int):
+    """Write a generated collection where the kind backend will look for it."""
+    json_path = os.path.join(directory, books.DATA_FILE)
+    write_json(json_path, count)
+    if kind == "sqlite":
+        migrate_json_to_sqlite(json_path, os.path.join(directory, books.DB_FILE))
+    elif kind == "snapshot":
+        migrate_json_to_snapshot(json_path, os.path.join(directory, books.SNAPSHOT_FILE))
+    elif kind == "chunked":
+        ChunkedStorage(os.path.join(directory, books.CHUNKS_DIR)).save(make_books(count))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="running server to test, e.g. http://127.0.0.1:8080")
+    parser.add_argument("--books", type=int, default=100_000, help="size of the generated collection")
+    parser.add_argument("--connections", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=20_000)
+    parser.add_argument("--write-ratio", type=float, default=0.1)
+    parser.add_argument("--storage", choices=books.STORAGE_KINDS, default="json",
+                        help="backend for the started server (ignored with --url)")
+    options = parser.parse_args()
+
+    server = tmp = None
+    if options.url:
+        url = urlsplit(options.url)
+        host, port = url.hostname, url.port or 80
+    else:
+        tmp = tempfile.TemporaryDirectory()
+        seed(tmp.name, options.storage, options.books)
+        host, port = "127.0.0.1", free_port()
+        server = subprocess.Popen(
+            [sys.executable, os.path.join(APP_DIR, "server.py"), "--port", str(port)],
+            cwd=tmp.name, env={**os.environ, "BOOKS_STORAGE": options.storage}, stdout=subprocess.DEVNULL)
+        wait_for_port(port)
+
+    try:
+        elapsed, latencies, errors = asyncio.run(run_load(host, port, options))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+            tmp.cleanup()
+
+    latencies.sort()
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(f"{len(latencies)} requests over {options.connections} connections in {elapsed:.2f}s")
+    print(f"  throughput  {len(latencies) / elapsed:10,.0f} req/s")
+    print(f"  p50         {statistics.median(latencies) * 1000:10.2f} ms")
+    print(f"  p99         {p99 * 1000:10.2f} ms")
+    print(f"  errors      {len(errors):10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+"""Synthetic book collections for the benchmarks."""
+
+import json
+import random
+from typing import Iterator, List
+
+from models import Book
+
+AUTHORS = 5000
+
+
+def make_books(count: int, seed: int = 0) -> List[Book]:
+    """Build count books with unique titles spread over a fixed pool of authors."""
+    rng = random.Random(seed)
+    return [
+        Book(f"Book {i:07d}", f"Author {rng.randrange(AUTHORS):04d}",
+             rng.randrange(1800, 2025), rng.random() < 0.3)
+        for i in range(count)
+    ]
+
+
+def iter_dicts(count: int, seed: int = 0) -> Iterator[dict]:
+    for book in make_books(count, seed):
+        yield {"title": book.title, "author": book.author, "year": book.year, "read": book.read}
+
+
+def write_json(path: str, count: int, seed: int = 0):
+    """Write a data.json with count synthetic books."""
+    with open(path, "w") as f:
+        json.dump(list(iter_dicts(count, seed)), f)
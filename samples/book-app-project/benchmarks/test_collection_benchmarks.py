@@ -0,0 +1,89 @@
+"""pytest-benchmark suite for the BookCollection hot paths.
+
+Run with:  python -m pytest benchmarks/ --benchmark-autosave
+Gate with: python -m pytest benchmarks/ --benchmark-compare --benchmark-compare-fail=mean:20%
+
+BENCH_SIZES picks the collection sizes (default 1000,100000,1000000).
+Peak traced memory for each operation is stored in the benchmark's
+extra_info and shows up in the saved JSON.
+"""
+
+import os
+import sys
+import tracemalloc
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from books import BookCollection  # noqa: E402
+from storage import JsonStorage  # noqa: E402
+from synthetic import make_books, write_json  # noqa: E402
+
+SIZES = [int(n) for n in os.environ.get("BENCH_SIZES", "1000,100000,1000000").split(",")]
+# Whole-collection operations get a fixed number of rounds so 1M stays bearable.
+ROUNDS = 3
+
+
+def peak_memory(func, *args) -> int:
+    """Peak bytes allocated while running func once."""
+    tracemalloc.start()
+    try:
+        func(*args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+@pytest.fixture(scope="module", params=SIZES, ids=lambda n: f"{n}books")
+def data_file(request, tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("books") / "data.json")
+    write_json(path, request.param)
+    return path, request.param
+
+
+@pytest.fixture
+def collection(data_file):
+    path, _ = data_file
+    collection = BookCollection(JsonStorage(path))
+    collection.load_books()
+    return collection
+
+
+def test_load_books(benchmark, data_file):
+    path, _ = data_file
+    collection = BookCollection(JsonStorage(path))
+    benchmark.extra_info["peak_bytes"] = peak_memory(collection.load_books)
+    benchmark.pedantic(collection.load_books, rounds=ROUNDS)
+
+
+def test_save_books(benchmark, collection, tmp_path):
+    collection.storage = JsonStorage(str(tmp_path / "out.json"))
+    benchmark.extra_info["peak_bytes"] = peak_memory(collection.save_books)
+    benchmark.pedantic(collection.save_books, rounds=ROUNDS)
+
+
+def test_find_book_by_title(benchmark, collection, data_file):
+    _, size = data_file
+    title = make_books(size)[size // 2].title.upper()
+    benchmark.extra_info["peak_bytes"] = peak_memory(collection.find_book_by_title, title)
+    assert benchmark(collection.find_book_by_title, title) is not None
+
+
+def test_find_by_author(benchmark, collection):
+    benchmark.extra_info["peak_bytes"] = peak_memory(collection.find_by_author, "author 0042")
+    benchmark(collection.find_by_author, "author 0042")
+
+
+def test_remove_book(benchmark, collection, data_file, tmp_path):
+    _, size = data_file
+    collection.storage = JsonStorage(str(tmp_path / "out.json"))
+    titles = iter(book.title for book in make_books(size))
+
+    def next_title():
+        return (next(titles),), {}
+
+    benchmark.extra_info["peak_bytes"] = peak_memory(collection.remove_book, next(titles))
+    benchmark.pedantic(collection.remove_book, setup=next_title, rounds=min(ROUNDS, size - 1))
@@ -1,29 +1,93 @@
+import heapq
+import itertools
+import os
 import sys
-from books import BookCollection
+import time
+import metrics
 
+# The collection, argparse and the file formats are imported by the commands
+# that use them, so `help` doesn't pay for loading storage backends.
 
-# Global collection instance
-collection = BookCollection()
+# Global collection instance, created on first use by get_collection();
+# BOOKS_STORAGE picks the backend (see books.STORAGE_KINDS)
+collection = None
 
 
-def show_books(books):
+def get_collection():
+    global collection
+    if collection is None:
+        from books import BookCollection, open_storage
+        collection = BookCollection(open_storage(os.environ.get("BOOKS_STORAGE", "json")))
+    return collection
+
+
+def _parser(prog):
+    import argparse
+    return argparse.ArgumentParser(prog=prog)
+
+
+LIST_FORMATS = ("table", "json", "jsonl")
+SORT_FIELDS = ("author", "title", "year")
+
+
+def sort_key(field):
+    """Key function that orders books by field, ignoring case."""
+    from models import fold_key
+    if field == "title":
+        return lambda book: fold_key(book.title)
+    if field == "author":
+        return lambda book: (fold_key(book.author), fold_key(book.title))
+    return lambda book: book.year
+
+
+@metrics.timed("show_books")
+def show_books(books, start=1, out=None):
     """Display books in a user-friendly format."""
-    if not books:
-        print("No books found.")
+    from formats import write_lines
+
+    out = out or sys.stdout
+    books = iter(books)
+    first = next(books, None)
+    if first is None:
+        out.write("No books found.\n")
         return
 
-    print("\nYour Book Collection:\n")
+    def lines():
+        yield "\nYour Book Collection:\n\n"
+        for index, book in enumerate(itertools.chain([first], books), start=start):
+            status = "✓" if book.read else " "
+            yield f"{index}. [{status}] {book.title} by {book.author} ({book.year})\n"
+        yield "\n"
 
-    for index, book in enumerate(books, start=1):
-        status = "✓" if book.read else " "
-        print(f"{index}. [{status}] {book.title} by {book.author} ({book.year})")
+    write_lines(out, lines())
 
-    print()
 
+def handle_list(args=()):
+    parser = _parser("book_app.py list")
+    parser.add_argument("--limit", type=int, help="show at most this many books")
+    parser.add_argument("--offset", type=int, default=0, help="skip this many books first")
+    parser.add_argument("--sort", choices=SORT_FIELDS)
+    parser.add_argument("--format", choices=LIST_FORMATS, default="table")
+    options = parser.parse_args(args)
+    if options.offset < 0 or (options.limit is not None and options.limit < 0):
+        parser.error("--limit and --offset must not be negative")
 
-def handle_list():
-    books = collection.list_books()
-    show_books(books)
+    books = get_collection().iter_books()
+    if options.sort:
+        key = sort_key(options.sort)
+        if options.limit is not None:
+            # Only the first offset + limit books need to be put in order.
+            books = heapq.nsmallest(options.offset + options.limit, books, key=key)
+        else:
+            books = sorted(books, key=key)
+    stop = None if options.limit is None else options.offset + options.limit
+    page = itertools.islice(books, options.offset, stop)
+
+    if options.format == "table":
+        show_books(page, start=options.offset + 1)
+    else:
+        from formats import write_rows
+        write_rows(sys.stdout, page, options.format)
 
 
 def handle_add():
@@ -35,7 +99,7 @@ def handle_add():
 
     try:
         year = int(year_str) if year_str else 0
-        collection.add_book(title, author, year)
+        get_collection().add_book(title, author, year)
         print("\nBook added successfully.\n")
     except ValueError as e:
         print(f"\nError: {e}\n")
@@ -45,7 +109,7 @@ def handle_remove():
     print("\nRemove a Book\n")
 
     title = input("Enter the title of the book to remove: ").strip()
-    collection.remove_book(title)
+    get_collection().remove_book(title)
 
     print("\nBook removed if it existed.\n")
 
@@ -54,39 +118,193 @@ def handle_find():
     print("\nFind Books by Author\n")
 
     author = input("Author name: ").strip()
-    books = collection.find_by_author(author)
+    books = get_collection().find_by_author(author)
+
+    show_books(books)
+
+
+def handle_search(args):
+    from search import FIELDS as SEARCH_FIELDS
+
+    parser = _parser("book_app.py search")
+    parser.add_argument("query", nargs="*", help="words to look for (prompted if omitted)")
+    parser.add_argument("--field", choices=SEARCH_FIELDS, help="only search titles or authors")
+    parser.add_argument("--limit", type=int, default=10)
+    options = parser.parse_args(args)
+
+    query = " ".join(options.query)
+    if not query:
+        print("\nSearch Titles and Authors\n")
+        query = input("Search: ").strip()
+
+    fields = (options.field,) if options.field else SEARCH_FIELDS
+    books = get_collection().search(query, fields=fields, limit=options.limit)
 
     show_books(books)
 
 
+def handle_import(args):
+    from formats import FORMATS, detect_format, read_rows
+
+    parser = _parser("book_app.py import")
+    parser.add_argument("path", help="JSON Lines or CSV file to read")
+    parser.add_argument("--format", choices=FORMATS)
+    options = parser.parse_args(args)
+    fmt = options.format or detect_format(options.path)
+
+    collection = get_collection()
+    imported = skipped = 0
+    start = time.perf_counter()
+    try:
+        with open(options.path, newline="") as f, collection.batch():
+            for line_no, row in read_rows(f, fmt):
+                try:
+                    if row is None:
+                        raise ValueError("Malformed row.")
+                    collection.add_book(row.get("title"), row.get("author"), row.get("year"), row["read"])
+                    imported += 1
+                except ValueError as e:
+                    print(f"Line {line_no}: {e}", file=sys.stderr)
+                    skipped += 1
+    except OSError as e:
+        print(f"\nError: {e}\n")
+        return
+    elapsed = time.perf_counter() - start
+
+    rate = imported / elapsed if elapsed else 0
+    print(f"Imported {imported} books ({skipped} skipped) in {elapsed:.2f}s ({rate:,.0f} rows/sec).")
+
+
+def handle_export(args):
+    from formats import FORMATS, detect_format, write_rows
+
+    parser = _parser("book_app.py export")
+    parser.add_argument("path", help="file to write, or - for stdout")
+    parser.add_argument("--format", choices=FORMATS)
+    options = parser.parse_args(args)
+    fmt = options.format or detect_format(options.path)
+
+    collection = get_collection()
+    start = time.perf_counter()
+    if options.path == "-":
+        count = write_rows(sys.stdout, collection.list_books(), fmt)
+        report = sys.stderr
+    else:
+        try:
+            with open(options.path, "w", newline="") as f:
+                count = write_rows(f, collection.list_books(), fmt)
+        except OSError as e:
+            print(f"\nError: {e}\n")
+            return
+        report = sys.stdout
+    elapsed = time.perf_counter() - start
+
+    rate = count / elapsed if elapsed else 0
+    print(f"Exported {count} books in {elapsed:.2f}s ({rate:,.0f} rows/sec).", file=report)
+
+
+def handle_migrate(args):
+    import books
+    from storage import migrate_json_to_snapshot, migrate_json_to_sqlite
+
+    parser = _parser("book_app.py migrate")
+    parser.add_argument("source", nargs="?", default=books.DATA_FILE, help="JSON file to read")
+    parser.add_argument("target", nargs="?", help="file to write (books.db or books.snap)")
+    parser.add_argument("--to", choices=("sqlite", "snapshot"), default="sqlite")
+    options = parser.parse_args(args)
+
+    if options.to == "sqlite":
+        target = options.target or books.DB_FILE
+        count = migrate_json_to_sqlite(options.source, target)
+    else:
+        target = options.target or books.SNAPSHOT_FILE
+        count = migrate_json_to_snapshot(options.source, target)
+    print(f"Copied {count} books from {options.source} to {target}.")
+    print(f"Run with BOOKS_STORAGE={options.to} to use it.")
+
+
 def show_help():
     print("""
 Book Collection Helper
 
 Commands:
-  list     - Show all books
+  list     - Show books (--limit N --offset N --sort year|title|author --format table|json|jsonl)
   add      - Add a new book
   remove   - Remove a book by title
   find     - Find books by author
+  search   - Search titles and authors (prefix, substring or close match)
+  import   - Import books from a .jsonl or .csv file
+  export   - Export books to a .jsonl or .csv file (- for stdout)
+  migrate  - Copy data.json into books.db (--to snapshot for books.snap)
+  shell    - Load the collection once and run commands interactively
+  daemon   - Serve the collection on a Unix socket (see daemon.py for the client)
   help     - Show this help message
+
+Put --profile before a command to print timings and byte counts to stderr
+and save a cProfile dump (BOOKS_METRICS=json|prometheus prints just the metrics).
 """)
 
 
-def main():
-    if len(sys.argv) < 2:
-        show_help()
-        return
+def handle_shell():
+    import shlex
 
-    command = sys.argv[1].lower()
+    print("\nBook Collection Shell (type help for commands, exit to quit)\n")
+    while True:
+        try:
+            line = input("books> ").strip()
+        except EOFError:
+            print()
+            break
+        if not line:
+            continue
+        try:
+            words = shlex.split(line)
+        except ValueError as e:
+            print(f"Error: {e}")
+            continue
+        if words[0].lower() in ("exit", "quit"):
+            break
+        # Pick up anything other processes saved since the last command.
+        get_collection().refresh()
+        try:
+            run_command(words[0].lower(), words[1:])
+        except SystemExit:
+            # argparse exits on bad arguments; stay in the shell.
+            pass
 
+
+def handle_daemon(args):
+    # daemon pulls in asyncio; only pay for that import when serving.
+    from daemon import DEFAULT_SOCKET, serve
+
+    parser = _parser("book_app.py daemon")
+    parser.add_argument("--socket", default=os.environ.get("BOOKS_SOCKET", DEFAULT_SOCKET))
+    options = parser.parse_args(args)
+
+    serve(get_collection(), options.socket)
+
+
+def run_command(command, args):
     if command == "list":
-        handle_list()
+        handle_list(args)
     elif command == "add":
         handle_add()
     elif command == "remove":
         handle_remove()
     elif command == "find":
         handle_find()
+    elif command == "search":
+        handle_search(args)
+    elif command == "import":
+        handle_import(args)
+    elif command == "export":
+        handle_export(args)
+    elif command == "migrate":
+        handle_migrate(args)
+    elif command == "shell":
+        handle_shell()
+    elif command == "daemon":
+        handle_daemon(args)
     elif command == "help":
         show_help()
     else:
@@ -94,5 +312,46 @@ def main():
         show_help()
 
 
+def main():
+    args = sys.argv[1:]
+    profile = bool(args) and args[0] == "--profile"
+    if profile:
+        args = args[1:]
+    if not args:
+        show_help()
+        return
+
+    command = args[0].lower()
+    metrics_format = os.environ.get("BOOKS_METRICS") or ("json" if profile else "")
+    if metrics_format and metrics_format not in metrics.FORMATS:
+        print(f"Unknown BOOKS_METRICS format: {metrics_format!r} (expected one of {', '.join(metrics.FORMATS)})")
+        return
+    if metrics_format:
+        metrics.enable()
+    profiler = None
+    if profile:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    try:
+        with metrics.timer("command"):
+            run_command(command, args[1:])
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profile_file = f"book_app-{command}.prof"
+            profiler.dump_stats(profile_file)
+            print(f"Profile written to {profile_file} (python -m pstats {profile_file})", file=sys.stderr)
+        if metrics_format:
+            sys.stderr.write(metrics.render(metrics_format))
+
+
 if __name__ == "__main__":
-    main()
+    try:
+        main()
+        sys.stdout.flush()
+    except BrokenPipeError:
+        # The reader went away (e.g. `list | head`); point stdout at devnull
+        # so the final flush at exit doesn't raise again.
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        sys.exit(1)
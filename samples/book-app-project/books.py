@@ -1,72 +1,402 @@
-import json
-from dataclasses import dataclass, asdict
-from typing import List, Optional
+import heapq
+import sys
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import metrics
+from models import Book, fold_key, validate_book
+from search import FIELDS, TrigramIndex
+from storage import (Change, ChunkedStorage, JournalStorage, JsonStorage, SnapshotStorage,
+                     SqliteStorage, _discard)
 
 DATA_FILE = "data.json"
+DB_FILE = "books.db"
+SNAPSHOT_FILE = "books.snap"
+CHUNKS_DIR = "books.d"
+
+STORAGE_KINDS = ("json", "journal", "sqlite", "snapshot", "chunked")
 
 
-@dataclass
-class Book:
-    title: str
-    author: str
-    year: int
-    read: bool = False
+def open_storage(kind: str = "json"):
+    """Create the storage backend named by kind."""
+    if kind == "json":
+        return JsonStorage(DATA_FILE)
+    if kind == "journal":
+        return JournalStorage(DATA_FILE)
+    if kind == "sqlite":
+        return SqliteStorage(DB_FILE)
+    if kind == "snapshot":
+        return SnapshotStorage(SNAPSHOT_FILE)
+    if kind == "chunked":
+        return ChunkedStorage(CHUNKS_DIR)
+    raise ValueError(f"Unknown storage backend: {kind!r} (expected one of {', '.join(STORAGE_KINDS)})")
 
 
 class BookCollection:
-    def __init__(self):
-        self.books: List[Book] = []
-        self.load_books()
+    def __init__(self, storage=None):
+        # Books keyed by id() keep insertion order and allow O(1) removal;
+        # the title and author indexes map case-folded names to books.
+        self._books: Dict[int, Book] = {}
+        self._by_title: Dict[str, List[Book]] = {}
+        self._by_author: Dict[str, List[Book]] = {}
+        self.storage = storage if storage is not None else JsonStorage(DATA_FILE)
+        # Inside batch() changes are queued here and written once on exit.
+        self._pending: Optional[List[Change]] = None
+        self._read_before: List[Tuple[Book, bool]] = []
+        # Built on the first search, then kept up to date by _insert/_delete.
+        self._search: Optional[TrigramIndex] = None
+        # Nothing is read from storage until the collection is first used.
+        self._loaded = False
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            self.load_books()
+
+    def _view(self):
+        """Storage's read-only snapshot, used for lookups until the collection is loaded.
+
+        Books read from it are copies; changing one changes nothing stored.
+        """
+        return None if self._loaded else self.storage.view()
 
+    @property
+    def books(self) -> List[Book]:
+        self._ensure_loaded()
+        return list(self._books.values())
+
+    @metrics.timed("load_books")
     def load_books(self):
-        """Load books from the JSON file if it exists."""
-        try:
-            with open(DATA_FILE, "r") as f:
-                data = json.load(f)
-                self.books = [Book(**b) for b in data]
-        except FileNotFoundError:
-            self.books = []
-        except json.JSONDecodeError:
-            print("Warning: data.json is corrupted. Starting with empty collection.")
-            self.books = []
+        """Load books from storage, applying any changes logged since its snapshot."""
+        with self.storage.lock():
+            self._reset(self.storage.load())
+            self._loaded = True
+            for op, book in self.storage.replay():
+                self._apply(op, book)
+
+    def refresh(self) -> bool:
+        """Pick up changes other processes have saved since we last read or wrote.
+
+        Returns True if anything changed.
+        """
+        if not self._loaded:
+            return False
+        with self.storage.lock():
+            if not self.storage.changed():
+                return False
+            self._sync([])
+        return True
+
+    def _sync(self, changes: List[Change]) -> List[Change]:
+        """Bring the collection up to date with storage, keeping our unsaved changes.
 
+        Returns our changes re-pointed at the books they now apply to.
+        """
+        # Records name books by title only, so memory has to keep the log's
+        # order or a duplicate title resolves to a different book here than
+        # on replay. Another process's records land before ours, so its books
+        # go before our unsaved adds. Our removes and reads were resolved
+        # against a state the log never had; for those, reload below.
+        external = None
+        if all(op == "add" for op, _ in changes):
+            external = self.storage.external_changes()
+        if external is not None:
+            ours = [book for _, book in changes if id(book) in self._books]
+            for book in ours:
+                self._delete(book)
+            for op, book in external:
+                self._apply(op, book)
+            for book in ours:
+                self._insert(book)
+            return changes
+        self._reset(self.storage.load())
+        for op, book in self.storage.replay():
+            self._apply(op, book)
+        resolved = []
+        for op, book in changes:
+            target = self._apply(op, book)
+            if target is not None:
+                resolved.append((op, target))
+        return resolved
+
+    def _reset(self, books: List[Book]):
+        self._books = {}
+        self._by_title = {}
+        self._by_author = {}
+        self._search = None
+        for book in books:
+            self._insert(book)
+
+    def _indexes(self, book: Book):
+        return (("title", self._by_title, fold_key(book.title)),
+                ("author", self._by_author, fold_key(book.author)))
+
+    def _insert(self, book: Book):
+        self._books[id(book)] = book
+        for field, index, key in self._indexes(book):
+            matches = index.get(key)
+            if matches is None:
+                index[key] = [book]
+                if self._search is not None:
+                    self._search.add(field, key)
+            else:
+                matches.append(book)
+
+    def _delete(self, book: Book):
+        del self._books[id(book)]
+        for field, index, key in self._indexes(book):
+            matches = index[key]
+            _discard(matches, book)
+            if not matches:
+                del index[key]
+                if self._search is not None:
+                    self._search.remove(field, key)
+
+    @metrics.timed("save_books")
     def save_books(self):
-        """Save the current book collection to JSON."""
-        with open(DATA_FILE, "w") as f:
-            json.dump([asdict(b) for b in self.books], f, indent=2)
-
-    def add_book(self, title: str, author: str, year: int) -> Book:
-        book = Book(title=title, author=author, year=year)
-        self.books.append(book)
-        self.save_books()
+        """Save the whole book collection to storage."""
+        self._ensure_loaded()
+        with self.storage.lock():
+            self.storage.save(self._books.values())
+
+    def _apply(self, op: str, book: Book) -> Optional[Book]:
+        """Apply a stored change and return the book it touched, if any."""
+        if op == "add":
+            self._insert(book)
+            return book
+        existing = self.find_book_by_title(book.title)
+        if existing:
+            if op == "read":
+                existing.read = True
+            elif op == "remove":
+                self._delete(existing)
+        return existing
+
+    def _persist(self, op: str, book: Book, was_read: bool = False):
+        """Record a change, writing it now unless a batch is open.
+
+        If the write fails, the change is undone in memory and the error
+        re-raised.
+        """
+        if self._pending is not None:
+            self._pending.append((op, book))
+            return
+        try:
+            self._write([(op, book)])
+        except BaseException:
+            self._undo(op, book, was_read)
+            raise
+
+    def _undo(self, op: str, book: Book, was_read: bool):
+        if op == "add" and id(book) in self._books:
+            self._delete(book)
+        elif op == "read" and id(book) in self._books:
+            book.read = was_read
+        else:
+            # A removed book can't be put back in its old place without
+            # rebuilding the collection, and if the write merged another
+            # process's changes first, ours was re-applied to freshly loaded
+            # books. Either way, reload from storage on next use.
+            self._reset([])
+            self._loaded = False
+
+    @metrics.timed("commit")
+    def _write(self, changes: List[Change]):
+        if not changes:
+            return
+        with self.storage.lock():
+            if self.storage.changed():
+                # Another process saved first; merge its changes so ours
+                # don't overwrite them.
+                changes = self._sync(changes)
+            self.storage.commit(self._books.values(), changes)
+
+    def _begin_batch(self) -> Dict[int, Book]:
+        self._ensure_loaded()
+        self.refresh()
+        self._pending = []
+        self._read_before = []
+        return dict(self._books)
+
+    def _rollback(self, snapshot: Dict[int, Book]):
+        for book, was_read in reversed(self._read_before):
+            book.read = was_read
+        self._reset(list(snapshot.values()))
+
+    def _end_batch(self):
+        self._pending = None
+        self._read_before = []
+
+    def _commit_unless_changed(self, books: List[Book], changes: List[Change]) -> bool:
+        """Commit changes unless another process has saved since we last synced."""
+        with self.storage.lock():
+            if self.storage.changed():
+                return False
+            self.storage.commit(books, changes)
+            return True
+
+    @contextmanager
+    def batch(self) -> Iterator["BookCollection"]:
+        """Apply many changes in memory and persist them once on exit.
+
+        If the block raises, the in-memory collection is rolled back to how
+        it was before the batch and nothing is written.
+        """
+        if self._pending is not None:
+            # Nested batches join the outermost one.
+            yield self
+            return
+        snapshot = self._begin_batch()
+        try:
+            yield self
+            self._write(self._pending)
+        except BaseException:
+            self._rollback(snapshot)
+            raise
+        finally:
+            self._end_batch()
+
+    @asynccontextmanager
+    async def batch_async(self) -> AsyncIterator["BookCollection"]:
+        """Like batch(), but the save runs in a worker thread.
+
+        The event loop keeps serving reads while a large collection is being
+        written. The caller must not change the collection or touch its
+        storage until the block exits.
+        """
+        import asyncio
+
+        if self._pending is not None:
+            yield self
+            return
+        snapshot = self._begin_batch()
+        try:
+            yield self
+            changes = self._pending
+            if changes:
+                books = list(self._books.values())
+                loop = asyncio.get_running_loop()
+                if not await loop.run_in_executor(None, self._commit_unless_changed, books, changes):
+                    # Another process saved first; merging its changes
+                    # touches the collection, so do it here on the loop.
+                    self._write(changes)
+        except BaseException:
+            self._rollback(snapshot)
+            raise
+        finally:
+            self._end_batch()
+
+    def add_book(self, title: str, author: str, year: int, read: bool = False) -> Book:
+        title, author, year = validate_book(title, author, year)
+        self._ensure_loaded()
+        book = Book(title=title, author=sys.intern(author), year=year, read=read)
+        self._insert(book)
+        self._persist("add", book)
         return book
 
+    def add_books(self, books: Iterable[Tuple[str, str, int]]) -> List[Book]:
+        """Add many (title, author, year) entries with a single save."""
+        with self.batch():
+            return [self.add_book(title, author, year) for title, author, year in books]
+
     def list_books(self) -> List[Book]:
+        view = self._view()
+        if view is not None:
+            return view.books()
         return self.books
 
+    def iter_books(self) -> Iterator[Book]:
+        """Iterate over the books without copying them into a new list."""
+        view = self._view()
+        if view is not None:
+            return iter(view)
+        self._ensure_loaded()
+        return iter(self._books.values())
+
+    @metrics.timed("find_book_by_title")
     def find_book_by_title(self, title: str) -> Optional[Book]:
-        for book in self.books:
-            if book.title.lower() == title.lower():
-                return book
-        return None
+        view = self._view()
+        if view is not None:
+            return view.find_title(title)
+        self._ensure_loaded()
+        matches = self._by_title.get(fold_key(title))
+        return matches[0] if matches else None
+
+    def _refresh_before_change(self):
+        # Another process may have added the book we're about to change.
+        if self._pending is None:
+            self._ensure_loaded()
+            self.refresh()
 
     def mark_as_read(self, title: str) -> bool:
+        self._refresh_before_change()
         book = self.find_book_by_title(title)
         if book:
+            was_read = book.read
+            if self._pending is not None:
+                self._read_before.append((book, was_read))
             book.read = True
-            self.save_books()
+            self._persist("read", book, was_read)
             return True
         return False
 
+    def mark_many_as_read(self, titles: Iterable[str]) -> int:
+        """Mark several books as read with a single save. Returns how many matched."""
+        with self.batch():
+            return sum(self.mark_as_read(title) for title in titles)
+
     def remove_book(self, title: str) -> bool:
         """Remove a book by title."""
+        self._refresh_before_change()
         book = self.find_book_by_title(title)
         if book:
-            self.books.remove(book)
-            self.save_books()
+            self._delete(book)
+            self._persist("remove", book)
             return True
         return False
 
+    def remove_books(self, titles: Iterable[str]) -> int:
+        """Remove several books by title with a single save. Returns how many matched."""
+        with self.batch():
+            return sum(self.remove_book(title) for title in titles)
+
+    @metrics.timed("find_by_author")
     def find_by_author(self, author: str) -> List[Book]:
         """Find all books by a given author."""
-        return [b for b in self.books if b.author.lower() == author.lower()]
+        view = self._view()
+        if view is not None:
+            return view.find_author(author)
+        self._ensure_loaded()
+        return list(self._by_author.get(fold_key(author), []))
+
+    @metrics.timed("search")
+    def search(self, query: str, fields: Iterable[str] = FIELDS, limit: int = 10) -> List[Book]:
+        """Find books whose title or author matches query, best matches first.
+
+        Exact matches rank above prefixes, then substrings, then near misses
+        such as typos.
+        """
+        fields = tuple(fields)
+        unknown = set(fields) - set(FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown search field: {', '.join(sorted(unknown))}")
+        query = fold_key(query.strip())
+        if not query:
+            return []
+        self._ensure_loaded()
+        if self._search is None:
+            self._search = TrigramIndex()
+            for field, index in (("title", self._by_title), ("author", self._by_author)):
+                for key in index:
+                    self._search.add(field, key)
+
+        best: Dict[int, Tuple[float, Book]] = {}
+        for score, field, key in self._search.search(query, fields, limit):
+            for book in (self._by_title if field == "title" else self._by_author)[key]:
+                current = best.get(id(book))
+                if current is None or score > current[0]:
+                    best[id(book)] = (score, book)
+        return [book for _, book in heapq.nlargest(limit, best.values(), key=lambda pair: pair[0])]
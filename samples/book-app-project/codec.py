@@ -0,0 +1,111 @@
+"""Encoders and decoders for the JSON snapshot.
+
+Every codec writes compact JSON (no indentation) in the same list-of-objects
+layout, so files written by one can be read by any other. BOOKS_CODEC picks
+one by name; "auto" (the default) uses the fastest installed library.
+"""
+
+import gc
+import json
+import os
+import sys
+from contextlib import contextmanager
+from typing import Iterable, List
+
+from models import Book
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+CODECS = ("auto", "json", "orjson", "msgspec")
+
+
+@contextmanager
+def _gc_paused():
+    """Building a million Books sets off many collections that can't free anything."""
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+class JsonCodec:
+    """Standard library json, building dicts and Books directly rather than via asdict/**kwargs."""
+
+    name = "json"
+
+    def encode(self, books: Iterable[Book]) -> bytes:
+        rows = [{"title": b.title, "author": b.author, "year": b.year, "read": b.read} for b in books]
+        return json.dumps(rows, separators=(",", ":")).encode()
+
+    def decode(self, data: bytes) -> List[Book]:
+        intern = sys.intern
+        with _gc_paused():
+            return [Book(d["title"], intern(d["author"]), d["year"], d.get("read", False))
+                    for d in json.loads(data)]
+
+
+class OrjsonCodec(JsonCodec):
+    """orjson, which serializes the Book dataclass natively."""
+
+    name = "orjson"
+
+    def encode(self, books: Iterable[Book]) -> bytes:
+        return orjson.dumps(books if isinstance(books, list) else list(books))
+
+    def decode(self, data: bytes) -> List[Book]:
+        intern = sys.intern
+        with _gc_paused():
+            return [Book(d["title"], intern(d["author"]), d["year"], d.get("read", False))
+                    for d in orjson.loads(data)]
+
+
+class MsgspecCodec(JsonCodec):
+    """msgspec, which decodes straight into Book instances."""
+
+    name = "msgspec"
+
+    def __init__(self):
+        self._encoder = msgspec.json.Encoder()
+        self._decoder = msgspec.json.Decoder(List[Book])
+
+    def encode(self, books: Iterable[Book]) -> bytes:
+        return self._encoder.encode(books if isinstance(books, list) else list(books))
+
+    def decode(self, data: bytes) -> List[Book]:
+        try:
+            with _gc_paused():
+                books = self._decoder.decode(data)
+        except msgspec.MsgspecError as e:
+            raise ValueError(str(e)) from None
+        for book in books:
+            book.author = sys.intern(book.author)
+        return books
+
+
+def get_codec(name: str = None):
+    """Return the codec called name, or the one named by BOOKS_CODEC."""
+    name = name or os.environ.get("BOOKS_CODEC", "auto")
+    if name == "auto":
+        name = "orjson" if orjson else "msgspec" if msgspec else "json"
+    if name == "json":
+        return JsonCodec()
+    if name == "orjson":
+        if orjson is None:
+            raise ValueError("BOOKS_CODEC=orjson needs the orjson package installed.")
+        return OrjsonCodec()
+    if name == "msgspec":
+        if msgspec is None:
+            raise ValueError("BOOKS_CODEC=msgspec needs the msgspec package installed.")
+        return MsgspecCodec()
+    raise ValueError(f"Unknown codec: {name!r} (expected one of {', '.join(CODECS)})")
@@ -0,0 +1,150 @@
+"""Serve a warm BookCollection over a Unix socket.
+
+Start it with `python book_app.py daemon`, then talk to it from scripts with
+BookClient or from the shell with `python daemon.py COMMAND key=value ...`.
+
+Each request is one line of JSON such as {"command": "find", "author": "Jane Austen"}
+and gets one line of JSON back: {"ok": true, "result": ...} or
+{"ok": false, "error": "..."}.
+"""
+
+import asyncio
+import itertools
+import json
+import os
+import socket
+import sys
+
+from formats import _parse_bool, book_dict
+
+DEFAULT_SOCKET = "books.sock"
+
+
+def _books(books):
+    return [book_dict(book) for book in books]
+
+
+def dispatch(collection, request: dict):
+    """Run one request against the collection and return its result."""
+    command = request.get("command")
+    if command == "ping":
+        return "pong"
+    if command == "list":
+        offset = int(request.get("offset", 0))
+        limit = request.get("limit")
+        stop = None if limit is None else offset + int(limit)
+        return _books(itertools.islice(collection.iter_books(), offset, stop))
+    if command == "get":
+        book = collection.find_book_by_title(request["title"])
+        return book_dict(book) if book else None
+    if command == "find":
+        return _books(collection.find_by_author(request["author"]))
+    if command == "search":
+        fields = request.get("fields") or ("title", "author")
+        if isinstance(fields, str):
+            # The command line sends fields=title,author as one string.
+            fields = [field.strip() for field in fields.split(",") if field.strip()]
+        return _books(collection.search(request["query"], fields=fields,
+                                        limit=int(request.get("limit", 10))))
+    if command == "add":
+        book = collection.add_book(request.get("title"), request.get("author"),
+                                   request.get("year", 0), _parse_bool(request.get("read", False)))
+        return book_dict(book)
+    if command == "remove":
+        return collection.remove_book(request["title"])
+    if command == "read":
+        return collection.mark_as_read(request["title"])
+    raise ValueError(f"Unknown command: {command!r}")
+
+
+async def _handle(collection, reader, writer):
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            try:
+                request = json.loads(line)
+                # Another process may have written since the last request.
+                collection.refresh()
+                # A change whose save fails is undone in memory by the collection.
+                response = {"ok": True, "result": dispatch(collection, request)}
+            except Exception as e:
+                # Bad requests and storage errors (OSError, sqlite3.Error)
+                # are reported to the client instead of dropping the connection.
+                response = {"ok": False, "error": str(e) or type(e).__name__}
+            writer.write((json.dumps(response) + "\n").encode())
+            await writer.drain()
+    finally:
+        writer.close()
+
+
+async def start_server(collection, path: str = DEFAULT_SOCKET):
+    """Load the collection and start accepting connections on path."""
+    collection.load_books()
+    if os.path.exists(path):
+        os.remove(path)
+    return await asyncio.start_unix_server(
+        lambda reader, writer: _handle(collection, reader, writer), path=path)
+
+
+def serve(collection, path: str = DEFAULT_SOCKET):
+    """Serve requests until interrupted."""
+    async def run():
+        server = await start_server(collection, path)
+        print(f"Serving {len(collection.books)} books on {path} (Ctrl+C to stop)")
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+class BookClient:
+    """Thin client that keeps one connection to the daemon open."""
+
+    def __init__(self, path: str = DEFAULT_SOCKET):
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.connect(path)
+        self._file = self._sock.makefile("rwb")
+
+    def call(self, command: str, **params):
+        """Send one request and return its result, raising ValueError on errors."""
+        self._file.write((json.dumps({"command": command, **params}) + "\n").encode())
+        self._file.flush()
+        line = self._file.readline()
+        if not line:
+            raise ConnectionError("Daemon closed the connection.")
+        response = json.loads(line)
+        if not response["ok"]:
+            raise ValueError(response["error"])
+        return response["result"]
+
+    def close(self):
+        self._file.close()
+        self._sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python daemon.py COMMAND [key=value ...]")
+        return
+    params = dict(arg.split("=", 1) for arg in sys.argv[2:])
+    socket_path = os.environ.get("BOOKS_SOCKET", DEFAULT_SOCKET)
+    with BookClient(socket_path) as client:
+        print(json.dumps(client.call(sys.argv[1], **params), indent=2))
+
+
+if __name__ == "__main__":
+    main()
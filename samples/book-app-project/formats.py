@@ -0,0 +1,92 @@
+import csv
+import json
+import os
+from typing import Iterable, Iterator, Optional, TextIO, Tuple
+
+FORMATS = ("jsonl", "csv")
+FIELDS = ("title", "author", "year", "read")
+
+
+def detect_format(path: str) -> str:
+    """Guess the file format from its extension, defaulting to JSON Lines."""
+    ext = os.path.splitext(path)[1].lower()
+    return "csv" if ext == ".csv" else "jsonl"
+
+
+def _parse_bool(value) -> bool:
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ("1", "true", "yes", "y")
+
+
+def read_rows(f: TextIO, fmt: str) -> Iterator[Tuple[int, Optional[dict]]]:
+    """Yield (line number, raw book dict) per row without reading the whole file.
+
+    Rows that cannot be parsed are yielded as None so the caller can report
+    them and carry on.
+    """
+    if fmt == "csv":
+        reader = csv.DictReader(f)
+        for row in reader:
+            row["read"] = _parse_bool(row.get("read") or False)
+            yield reader.line_num, row
+        return
+    for line_no, line in enumerate(f, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError:
+            yield line_no, None
+            continue
+        if not isinstance(row, dict):
+            yield line_no, None
+            continue
+        row["read"] = _parse_bool(row.get("read", False))
+        yield line_no, row
+
+
+def book_dict(book) -> dict:
+    return {"title": book.title, "author": book.author, "year": book.year, "read": book.read}
+
+
+def write_lines(f: TextIO, lines: Iterable[str], chunk_size: int = 1000):
+    """Write lines in chunks so large outputs cost a few big writes, not one per line."""
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) >= chunk_size:
+            f.write("".join(chunk))
+            chunk.clear()
+    if chunk:
+        f.write("".join(chunk))
+
+
+def write_rows(f: TextIO, books: Iterable, fmt: str) -> int:
+    """Write books as csv, jsonl or a json array and return how many were written."""
+    count = 0
+
+    def counted():
+        nonlocal count
+        for book in books:
+            count += 1
+            yield book
+
+    if fmt == "csv":
+        writer = csv.writer(f)
+        writer.writerow(FIELDS)
+        writer.writerows((book.title, book.author, book.year, book.read) for book in counted())
+    elif fmt == "json":
+        write_lines(f, _json_array_lines(counted()))
+    else:
+        write_lines(f, (json.dumps(book_dict(book)) + "\n" for book in counted()))
+    return count
+
+
+def _json_array_lines(books: Iterable) -> Iterator[str]:
+    yield "["
+    separator = "\n  "
+    for book in books:
+        yield separator + json.dumps(book_dict(book))
+        separator = ",\n  "
+    yield "\n]\n"
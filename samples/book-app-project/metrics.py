@@ -0,0 +1,110 @@
+"""Opt-in timings and byte counts for book_app.py.
+
+Nothing is recorded until enable() is called; book_app.py does that for
+--profile or when BOOKS_METRICS is set to one of FORMATS. The results are
+written to stderr when the command finishes.
+"""
+
+import time
+from contextlib import contextmanager
+from functools import wraps
+from typing import Dict, List
+
+FORMATS = ("json", "prometheus")
+
+_enabled = False
+# Timer name -> [calls, total seconds, slowest call in seconds].
+_timers: Dict[str, List[float]] = {}
+_counters: Dict[str, int] = {}
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def reset():
+    """Stop recording and forget everything recorded so far."""
+    global _enabled
+    _enabled = False
+    _timers.clear()
+    _counters.clear()
+
+
+def _observe(name: str, seconds: float):
+    timer = _timers.get(name)
+    if timer is None:
+        _timers[name] = [1, seconds, seconds]
+    else:
+        timer[0] += 1
+        timer[1] += seconds
+        timer[2] = max(timer[2], seconds)
+
+
+@contextmanager
+def timer(name: str):
+    """Time the body of a with block under name."""
+    if not _enabled:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _observe(name, time.perf_counter() - start)
+
+
+def timed(name: str):
+    """Decorator version of timer(), cheap enough for hot lookups when disabled."""
+    def decorate(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                _observe(name, time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+
+def count(name: str, amount: int = 1):
+    """Add amount to the counter called name."""
+    if _enabled:
+        _counters[name] = _counters.get(name, 0) + amount
+
+
+def snapshot() -> dict:
+    """Everything recorded so far as plain data."""
+    return {
+        "timers": {name: {"calls": calls, "total_ms": round(total * 1000, 3),
+                          "max_ms": round(slowest * 1000, 3)}
+                   for name, (calls, total, slowest) in _timers.items()},
+        "counters": dict(_counters),
+    }
+
+
+def render(fmt: str = "json") -> str:
+    """Format what has been recorded as JSON or Prometheus text exposition."""
+    if fmt == "json":
+        import json  # Only needed when reporting; keeps startup light.
+        return json.dumps(snapshot(), indent=2) + "\n"
+    if fmt != "prometheus":
+        raise ValueError(f"Unknown metrics format: {fmt!r} (expected one of {', '.join(FORMATS)})")
+    lines = ["# TYPE book_app_duration_seconds summary"]
+    for name, (calls, total, _) in _timers.items():
+        lines.append(f'book_app_duration_seconds_count{{op="{name}"}} {calls}')
+        lines.append(f'book_app_duration_seconds_sum{{op="{name}"}} {total:.6f}')
+    lines.append("# TYPE book_app_duration_seconds_max gauge")
+    for name, (_, _, slowest) in _timers.items():
+        lines.append(f'book_app_duration_seconds_max{{op="{name}"}} {slowest:.6f}')
+    for name, value in _counters.items():
+        lines.append(f"# TYPE book_app_{name}_total counter")
+        lines.append(f"book_app_{name}_total {value}")
+    return "\n".join(lines) + "\n"
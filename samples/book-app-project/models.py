@@ -0,0 +1,42 @@
+import sys
+from dataclasses import dataclass
+from typing import Tuple
+
+
+@dataclass(slots=True)
+class Book:
+    title: str
+    author: str
+    year: int
+    read: bool = False
+
+
+def validate_book(title: str, author: str, year) -> Tuple[str, str, int]:
+    """Check and normalize the fields of a new book, raising ValueError if invalid."""
+    if not isinstance(title or "", str):
+        raise ValueError(f"Invalid title: {title!r}")
+    if not isinstance(author or "", str):
+        raise ValueError(f"Invalid author: {author!r}")
+    title = (title or "").strip()
+    author = (author or "").strip()
+    if not title:
+        raise ValueError("Title is required.")
+    if not author:
+        raise ValueError("Author is required.")
+    if isinstance(year, bool):
+        raise ValueError(f"Invalid year: {year!r}")
+    try:
+        year = int(year)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid year: {year!r}") from None
+    return title, author, year
+
+
+def book_from_dict(data: dict) -> Book:
+    """Build a Book from a stored dict, sharing one string per author name."""
+    return Book(data["title"], sys.intern(data["author"]), data["year"], data.get("read", False))
+
+
+def fold_key(text: str) -> str:
+    """Case-insensitive lookup key for titles and authors."""
+    return text.casefold()
@@ -0,0 +1,101 @@
+from collections import Counter
+from difflib import SequenceMatcher
+from typing import Dict, Iterable, List, Set, Tuple
+
+FIELDS = ("title", "author")
+
+# Scores: exact match > prefix > substring > fuzzy (similarity ratio below 1).
+EXACT, PREFIX, SUBSTRING = 4.0, 3.0, 2.0
+FUZZY_CUTOFF = 0.75
+# Only this many of the best trigram candidates are compared for typos, and
+# grams shared by more than COMMON_GRAM strings are ignored when picking them.
+FUZZY_CANDIDATES = 50
+COMMON_GRAM = 5000
+
+
+def trigrams(text: str, pad_end: bool = True) -> Set[str]:
+    """Trigrams of text, padded so the first letters form prefix grams.
+
+    Queries leave the end unpadded so that "du" matches "dune" as a prefix.
+    """
+    padded = "  " + text + (" " if pad_end else "")
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _fuzzy_ratio(query: str, key: str) -> float:
+    """Best similarity between query and either the whole key or one of its words."""
+    best = SequenceMatcher(None, query, key).ratio()
+    if " " in key and " " not in query:
+        for word in key.split():
+            best = max(best, SequenceMatcher(None, query, word).ratio())
+    return best
+
+
+class TrigramIndex:
+    """Maps trigrams to the case-folded title and author strings that contain them.
+
+    Keys are distinct strings, so an author with many books is indexed once.
+    """
+
+    def __init__(self):
+        self._postings: Dict[str, Dict[str, Set[str]]] = {field: {} for field in FIELDS}
+        # Every indexed key, scanned for queries too short to have inner grams.
+        self._keys: Dict[str, Set[str]] = {field: set() for field in FIELDS}
+
+    def add(self, field: str, key: str):
+        self._keys[field].add(key)
+        postings = self._postings[field]
+        for gram in trigrams(key):
+            postings.setdefault(gram, set()).add(key)
+
+    def remove(self, field: str, key: str):
+        self._keys[field].discard(key)
+        postings = self._postings[field]
+        for gram in trigrams(key):
+            keys = postings.get(gram)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del postings[gram]
+
+    def search(self, query: str, fields: Iterable[str] = FIELDS,
+               limit: int = FUZZY_CANDIDATES) -> List[Tuple[float, str, str]]:
+        """Return (score, field, key) for indexed strings that match query.
+
+        Near misses are only looked for when there are fewer than limit
+        prefix or substring matches.
+        """
+        grams = trigrams(query, pad_end=False)
+        # Grams starting with the padding only match at the start of a key;
+        # a key containing query anywhere has all of the others.
+        inner = [g for g in grams if not g.startswith(" ")]
+        results = []
+        for field in fields:
+            postings = self._postings[field]
+            found = len(results)
+            if inner:
+                # Intersect the rarest posting sets first.
+                required = sorted((postings.get(g, set()) for g in inner), key=len)
+                candidates = set.intersection(*required) if required[0] else set()
+            else:
+                # One or two letters: any key containing them may match.
+                candidates = {key for key in self._keys[field] if query in key}
+            for key in candidates:
+                if key.startswith(query):
+                    results.append((EXACT if key == query else PREFIX + len(query) / len(key), field, key))
+                elif query in key:
+                    results.append((SUBSTRING + len(query) / len(key), field, key))
+            if len(results) - found >= limit:
+                continue
+            counts: Counter = Counter()
+            for gram in grams:
+                keys = postings.get(gram, ())
+                if len(keys) <= COMMON_GRAM:
+                    counts.update(keys)
+            for key, _ in counts.most_common(FUZZY_CANDIDATES + len(candidates)):
+                if key in candidates:
+                    continue
+                ratio = _fuzzy_ratio(query, key)
+                if ratio >= FUZZY_CUTOFF:
+                    results.append((ratio, field, key))
+        return results
@@ -0,0 +1,248 @@
+"""Asyncio HTTP/JSON API over a BookCollection.
+
+Usage: python server.py [--host 127.0.0.1] [--port 8080]
+
+Routes:
+  GET    /books                  list (?limit=&offset=), by author (?author=) or search (?q=)
+  GET    /books/{title}          one book
+  POST   /books                  add {"title", "author", "year", "read"}
+  DELETE /books/{title}          remove
+  POST   /books/{title}/read     mark as read
+
+Reads are answered straight from the in-memory collection. Writes go through
+a queue to a single writer task, which applies everything waiting in the
+queue inside one batch so they share a single save. The save runs in a
+worker thread so reads keep being answered while it is written, and changes
+other processes save are picked up every refresh_interval seconds.
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from books import BookCollection, open_storage
+from formats import book_dict
+
+REASONS = {200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found",
+           405: "Method Not Allowed", 413: "Payload Too Large", 500: "Internal Server Error"}
+MAX_BODY = 1024 * 1024
+
+
+class HttpError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class BookServer:
+    def __init__(self, collection: BookCollection, refresh_interval: float = 1.0):
+        self.collection = collection
+        self.refresh_interval = refresh_interval
+        self._writes: asyncio.Queue = asyncio.Queue()
+        # Held while the writer or refresher uses storage.
+        self._storage_lock = asyncio.Lock()
+        self._tasks = []
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8080):
+        self.collection.load_books()
+        self._tasks = [asyncio.create_task(self._writer()), asyncio.create_task(self._refresher())]
+        return await asyncio.start_server(self._handle, host, port)
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+
+    def _write(self, method, *args):
+        """Queue a collection method call for the writer task and wait for its result."""
+        future = asyncio.get_running_loop().create_future()
+        self._writes.put_nowait((future, method, args))
+        return future
+
+    async def _writer(self):
+        while True:
+            queued = [await self._writes.get()]
+            while not self._writes.empty():
+                queued.append(self._writes.get_nowait())
+            # Writes that arrive while this batch is being saved wait in the
+            # queue and go into the next batch together.
+            results = []
+            try:
+                async with self._storage_lock, self.collection.batch_async():
+                    for future, method, args in queued:
+                        try:
+                            results.append((future, method(*args), None))
+                        except ValueError as e:
+                            results.append((future, None, e))
+            except Exception as e:
+                for future, _, _ in queued:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for future, result, error in results:
+                if future.done():
+                    continue
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(result)
+
+    async def _refresher(self):
+        """Pick up changes other processes have saved, at most once per interval."""
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            async with self._storage_lock:
+                self.collection.refresh()
+
+    async def route(self, method: str, target: str, body: bytes):
+        """Return (status, payload) for one request."""
+        url = urlsplit(target)
+        parts = [unquote(p) for p in url.path.strip("/").split("/")]
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        if not parts or parts[0] != "books":
+            raise HttpError(404, "Not found")
+        collection = self.collection
+
+        if len(parts) == 1:
+            if method == "GET":
+                return 200, self._list(query)
+            if method == "POST":
+                data = _json_body(body)
+                book = await self._write(collection.add_book, data.get("title"), data.get("author"),
+                                         data.get("year", 0), bool(data.get("read", False)))
+                return 201, book_dict(book)
+        elif len(parts) == 2:
+            title = parts[1]
+            if method == "GET":
+                book = collection.find_book_by_title(title)
+                if book is None:
+                    raise HttpError(404, f"No book titled {title!r}")
+                return 200, book_dict(book)
+            if method == "DELETE":
+                if not await self._write(collection.remove_book, title):
+                    raise HttpError(404, f"No book titled {title!r}")
+                return 200, {"removed": title}
+        elif len(parts) == 3 and parts[2] == "read":
+            if method == "POST":
+                book = await self._write(self._mark_as_read, parts[1])
+                if book is None:
+                    raise HttpError(404, f"No book titled {parts[1]!r}")
+                return 200, book_dict(book)
+        else:
+            raise HttpError(404, "Not found")
+        raise HttpError(405, f"{method} not allowed here")
+
+    def _mark_as_read(self, title: str):
+        """Mark a book as read and return it, or None if there is no such book.
+
+        The lookup runs in the same queued write, so a removal queued after
+        it can't make the book disappear before the response is built.
+        """
+        if not self.collection.mark_as_read(title):
+            return None
+        return self.collection.find_book_by_title(title)
+
+    def _list(self, query: dict):
+        try:
+            offset = int(query.get("offset", 0))
+            limit = int(query["limit"]) if "limit" in query else None
+        except ValueError:
+            raise HttpError(400, "limit and offset must be integers") from None
+        if "author" in query:
+            books = self.collection.find_by_author(query["author"])
+        elif "q" in query:
+            books = self.collection.search(query["q"], limit=limit or 10)
+        else:
+            books = self.collection.iter_books()
+        stop = None if limit is None else offset + limit
+        return [book_dict(b) for b in itertools.islice(books, offset, stop)]
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                keep_alive = headers.get("connection", "").lower() != "close"
+
+                try:
+                    method, target, _ = request_line.decode("latin-1").split(" ", 2)
+                    length = int(headers.get("content-length", 0))
+                    if length > MAX_BODY:
+                        keep_alive = False
+                        raise HttpError(413, "Request body too large")
+                    body = await reader.readexactly(length) if length else b""
+                    status, payload = await self.route(method.upper(), target, body)
+                except HttpError as e:
+                    status, payload = e.status, {"error": str(e)}
+                except ValueError as e:
+                    status, payload = 400, {"error": str(e)}
+                except Exception as e:
+                    status, payload = 500, {"error": f"{type(e).__name__}: {e}"}
+                    keep_alive = False
+
+                data = json.dumps(payload).encode()
+                writer.write(
+                    f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+                    f"Content-Type: application/json\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+def _json_body(body: bytes) -> dict:
+    try:
+        data = json.loads(body or b"{}")
+    except json.JSONDecodeError:
+        raise HttpError(400, "Body must be JSON") from None
+    if not isinstance(data, dict):
+        raise HttpError(400, "Body must be a JSON object")
+    return data
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the book collection over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    options = parser.parse_args()
+
+    collection = BookCollection(open_storage(os.environ.get("BOOKS_STORAGE", "json")))
+
+    async def run():
+        app = BookServer(collection)
+        server = await app.start(options.host, options.port)
+        print(f"Serving {len(collection.books)} books on http://{options.host}:{options.port}/books")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            await app.stop()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
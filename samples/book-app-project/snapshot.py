@@ -0,0 +1,160 @@
+"""Binary snapshot format that can be queried without decoding every book.
+
+Layout (all integers little-endian):
+
+    header        magic, number of books
+    record table  one fixed-width RECORD per book, in collection order
+    title index   record numbers sorted by case-folded title
+    string heap   UTF-8 titles and authors; each author is stored once
+
+Records point into the heap by offset and length, so the book at any
+position can be decoded on its own and a title is found by binary search
+over the index.
+"""
+
+import mmap
+import os
+import struct
+import sys
+from bisect import bisect_left
+from typing import Iterable, Iterator, List, Optional
+
+from models import Book, fold_key
+
+MAGIC = b"BOOKSNP1"
+HEADER = struct.Struct("<8sI")
+# title offset, title length, author offset, author length, year, read
+RECORD = struct.Struct("<IIIIq?")
+INDEX = struct.Struct("<I")
+
+
+class Snapshot:
+    """Read-only view of a snapshot held in bytes or a memory map.
+
+    Books are built on demand, so opening a snapshot costs the same however
+    many books it holds.
+    """
+
+    def __init__(self, data):
+        try:
+            magic, count = HEADER.unpack_from(data)
+        except struct.error:
+            raise ValueError("Snapshot is truncated.") from None
+        if magic != MAGIC:
+            raise ValueError("Not a book snapshot.")
+        self._data = data
+        self._count = count
+        self._records = HEADER.size
+        self._index = self._records + count * RECORD.size
+        self._heap = self._index + count * INDEX.size
+        if len(data) < self._heap:
+            raise ValueError("Snapshot is truncated.")
+        # Decoded author names by heap offset, so books share one string each.
+        self._authors = {}
+
+    @classmethod
+    def open(cls, path: str) -> "Snapshot":
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                raise ValueError("Snapshot is empty.")
+            return cls(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _string(self, offset: int, length: int) -> str:
+        start = self._heap + offset
+        return self._data[start:start + length].decode()
+
+    def _author(self, offset: int, length: int) -> str:
+        author = self._authors.get(offset)
+        if author is None:
+            author = self._authors[offset] = sys.intern(self._string(offset, length))
+        return author
+
+    def book(self, position: int) -> Book:
+        title_at, title_len, author_at, author_len, year, read = RECORD.unpack_from(
+            self._data, self._records + position * RECORD.size)
+        return Book(self._string(title_at, title_len), self._author(author_at, author_len), year, read)
+
+    def __iter__(self) -> Iterator[Book]:
+        return (self.book(i) for i in range(self._count))
+
+    def books(self) -> List[Book]:
+        """Decode every book at once, which is faster than iterating."""
+        records = self._data[self._records:self._index]
+        heap = self._data[self._heap:]
+        authors = {}
+        books = []
+        for title_at, title_len, author_at, author_len, year, read in RECORD.iter_unpack(records):
+            author = authors.get(author_at)
+            if author is None:
+                author = authors[author_at] = sys.intern(heap[author_at:author_at + author_len].decode())
+            books.append(Book(heap[title_at:title_at + title_len].decode(), author, year, read))
+        return books
+
+    def _title_key(self, rank: int) -> str:
+        """Case-folded title of the rank-th book in title order."""
+        (position,) = INDEX.unpack_from(self._data, self._index + rank * INDEX.size)
+        title_at, title_len = RECORD.unpack_from(self._data, self._records + position * RECORD.size)[:2]
+        return fold_key(self._string(title_at, title_len))
+
+    def find_title(self, title: str) -> Optional[Book]:
+        """First book (in collection order) with this title, ignoring case."""
+        key = fold_key(title)
+        rank = bisect_left(range(self._count), key, key=self._title_key)
+        if rank == self._count or self._title_key(rank) != key:
+            return None
+        (position,) = INDEX.unpack_from(self._data, self._index + rank * INDEX.size)
+        return self.book(position)
+
+    def find_author(self, author: str) -> List[Book]:
+        """Every book by this author, in collection order, ignoring case."""
+        key = fold_key(author)
+        records = self._data[self._records:self._index]
+        # Authors are stored once, so each heap offset only needs folding once.
+        matches = {}
+        found = []
+        for position, (_, _, author_at, author_len, _, _) in enumerate(RECORD.iter_unpack(records)):
+            match = matches.get(author_at)
+            if match is None:
+                match = matches[author_at] = fold_key(self._string(author_at, author_len)) == key
+            if match:
+                found.append(self.book(position))
+        return found
+
+    def close(self):
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+
+
+class SnapshotCodec:
+    """Encode and decode whole collections in the snapshot format."""
+
+    name = "snapshot"
+
+    def encode(self, books: Iterable[Book]) -> bytes:
+        books = list(books)
+        heap = bytearray()
+        authors = {}
+        records = bytearray()
+        try:
+            for book in books:
+                title = book.title.encode()
+                title_at = len(heap)
+                heap += title
+                author = authors.get(book.author)
+                if author is None:
+                    name = book.author.encode()
+                    author = authors[book.author] = (len(heap), len(name))
+                    heap += name
+                records += RECORD.pack(title_at, len(title), *author, book.year, book.read)
+        except struct.error as e:
+            raise ValueError(f"Can't write snapshot: {e}") from None
+        # sorted() is stable, so books sharing a title stay in collection order.
+        order = sorted(range(len(books)), key=lambda i: fold_key(books[i].title))
+        index = struct.pack(f"<{len(order)}I", *order)
+        return HEADER.pack(MAGIC, len(books)) + records + index + heap
+
+    def decode(self, data: bytes) -> List[Book]:
+        return Snapshot(data).books()
@@ -0,0 +1,645 @@
+import itertools
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+from contextlib import contextmanager, nullcontext
+from operator import itemgetter
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, writes are still atomic
+    fcntl = None
+
+import metrics
+from codec import get_codec
+from models import Book, book_from_dict, fold_key
+from snapshot import Snapshot, SnapshotCodec
+
+# A change is an (op, book) pair where op is "add", "read" or "remove".
+Change = Tuple[str, Book]
+
+# The journal lives next to the snapshot and is folded back into it once it
+# grows past COMPACT_THRESHOLD bytes.
+JOURNAL_SUFFIX = ".log"
+COMPACT_THRESHOLD = 1024 * 1024
+LOCK_SUFFIX = ".lock"
+# Books per file in ChunkedStorage.
+CHUNK_SIZE = 1000
+MANIFEST = "manifest.json"
+
+
+def _file_stamp(path: str) -> Optional[List[int]]:
+    """Identify a version of a file by size, modification time and inode."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return [st.st_size, st.st_mtime_ns, st.st_ino]
+
+
+def _file_size(path: str) -> int:
+    try:
+        return os.path.getsize(path)
+    except FileNotFoundError:
+        return 0
+
+
+def _record(op: str, book: Book) -> str:
+    book = {"title": book.title, "author": book.author, "year": book.year, "read": book.read}
+    return json.dumps({"op": op, "book": book}, separators=(",", ":")) + "\n"
+
+
+def _discard(books: List[Book], book: Book):
+    """Remove a specific book object (not just an equal one) from a list."""
+    for i, b in enumerate(books):
+        if b is book:
+            del books[i]
+            return
+
+
+def _atomic_write(path: str, data: bytes):
+    """Write data to a temporary file and swap it in, so readers never see a partial file."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_file = tempfile.mkstemp(dir=directory, prefix=os.path.basename(path), suffix=".tmp")
+    metrics.count("bytes_written", len(data))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, path)
+    except BaseException:
+        try:
+            os.remove(tmp_file)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+class FileLock:
+    """Reentrant advisory lock held on a side file while storage is read or changed."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._depth = 0
+        self._file = None
+
+    def __enter__(self):
+        if self._depth == 0 and fcntl is not None:
+            self._file = open(self.path, "a")
+            fcntl.flock(self._file, fcntl.LOCK_EX)
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        self._depth -= 1
+        if self._depth == 0 and self._file is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+
+
+class JsonStorage:
+    """Keep the whole collection in one JSON file, rewritten on every commit."""
+
+    def __init__(self, path: str, codec=None):
+        self.path = path
+        self.codec = codec or get_codec()
+        self._lock = FileLock(path + LOCK_SUFFIX)
+        # Version of the file as of our last load or save.
+        self._stamp: Optional[List[int]] = None
+
+    def lock(self):
+        """Hold this while reading or changing storage to keep other processes out."""
+        return self._lock
+
+    def load(self) -> List[Book]:
+        """Return every book in the snapshot."""
+        self._stamp = _file_stamp(self.path)
+        try:
+            with open(self.path, "rb") as f:
+                data = f.read()
+            metrics.count("bytes_read", len(data))
+            return self.codec.decode(data)
+        except FileNotFoundError:
+            return []
+        except (ValueError, KeyError, TypeError):
+            name = os.path.basename(self.path)
+            print(f"Warning: {name} is corrupted. Starting with empty collection.")
+            return []
+
+    def replay(self) -> Iterator[Change]:
+        """Yield changes recorded since the snapshot returned by load()."""
+        return iter(())
+
+    def changed(self) -> bool:
+        """Whether another process has written since our last load or save."""
+        return _file_stamp(self.path) != self._stamp
+
+    def external_changes(self) -> Optional[List[Change]]:
+        """Changes other processes have written since we last looked.
+
+        Returns None when they can't be read incrementally and the caller
+        has to load everything again.
+        """
+        return None
+
+    def view(self) -> Optional[Snapshot]:
+        """A read-only Snapshot or SqliteView of storage, queried without loading it.
+
+        None when the backend has no such view or it can't be used right now.
+        """
+        return None
+
+    def save(self, books: Iterable[Book]):
+        """Replace the stored collection with books."""
+        _atomic_write(self.path, self.codec.encode(books))
+        self._stamp = _file_stamp(self.path)
+
+    def commit(self, books: Iterable[Book], changes: List[Change]):
+        """Persist a group of changes; books is the whole collection after them."""
+        self.save(books)
+
+    def close(self):
+        pass
+
+
+class JournalStorage(JsonStorage):
+    """JSON snapshot plus an append-only log of changes made since it was written.
+
+    Other processes' appends are picked up by reading only the new end of
+    the log.
+    """
+
+    def __init__(self, path: str, compact_threshold: int = COMPACT_THRESHOLD, codec=None):
+        super().__init__(path, codec)
+        self.journal_file = path + JOURNAL_SUFFIX
+        self.compact_threshold = compact_threshold
+        # Where our next record goes (0 starts a fresh log) and how big the
+        # log was when we last read or wrote it.
+        self._offset = 0
+        self._log_size = 0
+        self._replayed: List[Change] = []
+
+    def load(self) -> List[Book]:
+        books = super().load()
+        self._offset = 0
+        self._replayed = self._read_log()
+        return books
+
+    def replay(self) -> Iterator[Change]:
+        replayed, self._replayed = self._replayed, []
+        return iter(replayed)
+
+    def _read_log(self) -> List[Change]:
+        """Read complete records from self._offset onwards and advance past them."""
+        changes = []
+        try:
+            f = open(self.journal_file, "rb")
+        except FileNotFoundError:
+            self._offset = self._log_size = 0
+            return changes
+        with f:
+            self._log_size = os.fstat(f.fileno()).st_size
+            if self._offset == 0:
+                header = f.readline()
+                try:
+                    base = json.loads(header)["base"]
+                except (json.JSONDecodeError, KeyError, TypeError):
+                    return changes
+                if base != self._stamp or not header.endswith(b"\n"):
+                    # Log was already folded into a newer snapshot; our
+                    # next commit starts a new one.
+                    return changes
+                self._offset = len(header)
+            f.seek(self._offset)
+            for line in iter(f.readline, b""):
+                if not line.endswith(b"\n"):
+                    # A torn write at the tail; our next commit overwrites it.
+                    break
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    break
+                changes.append((entry["op"], book_from_dict(entry["book"])))
+                self._offset += len(line)
+                metrics.count("bytes_read", len(line))
+        return changes
+
+    def changed(self) -> bool:
+        return super().changed() or _file_size(self.journal_file) != self._log_size
+
+    def external_changes(self) -> Optional[List[Change]]:
+        if super().changed():
+            # Someone compacted the log into a new snapshot.
+            return None
+        return self._read_log()
+
+    def save(self, books: Iterable[Book]):
+        """Write a fresh snapshot and discard the log it supersedes."""
+        super().save(books)
+        # A crash before this point leaves a log whose header no longer
+        # matches the snapshot, so it is ignored on the next load.
+        try:
+            os.remove(self.journal_file)
+        except FileNotFoundError:
+            pass
+        self._offset = self._log_size = 0
+
+    def commit(self, books: Iterable[Book], changes: List[Change]):
+        records = "".join(_record(op, book) for op, book in changes).encode()
+        with open(self.journal_file, "ab") as f:
+            # Drop any stale log or torn tail past what we have read.
+            f.truncate(self._offset)
+            if self._offset == 0:
+                f.write((json.dumps({"base": self._stamp}) + "\n").encode())
+            f.write(records)
+            metrics.count("bytes_written", len(records))
+            self._offset = self._log_size = f.tell()
+        if self._offset >= self.compact_threshold:
+            self.save(books)
+
+
+class SnapshotStorage(JsonStorage):
+    """Keep the collection in a binary snapshot (see snapshot.py), rewritten on every commit.
+
+    Until the collection is loaded, title lookups and listing are answered
+    from a memory map of the file.
+    """
+
+    def __init__(self, path: str):
+        super().__init__(path, codec=SnapshotCodec())
+        self._view: Optional[Snapshot] = None
+        self._view_stamp: Optional[List[int]] = None
+
+    def view(self) -> Optional[Snapshot]:
+        stamp = _file_stamp(self.path)
+        if stamp is None:
+            return None
+        if stamp != self._view_stamp:
+            self.close()
+            try:
+                self._view = Snapshot.open(self.path)
+            except (OSError, ValueError):
+                # Let load() deal with a missing or corrupted file.
+                return None
+            self._view_stamp = stamp
+        return self._view
+
+    def close(self):
+        if self._view is not None:
+            self._view.close()
+            self._view = self._view_stamp = None
+
+
+class ChunkedStorage:
+    """Split the collection over many small JSON files and rewrite only the ones a commit touches.
+
+    Books stay in collection order: new ones go into the last chunk and a
+    new chunk is started once it holds CHUNK_SIZE books. Changed chunks are
+    written to new files and manifest.json, which lists the current files
+    in order, is replaced last, so a crash mid-commit leaves the previous
+    version intact.
+    """
+
+    def __init__(self, path: str, chunk_size: int = CHUNK_SIZE, codec=None):
+        self.path = path
+        self.manifest_file = os.path.join(path, MANIFEST)
+        self.chunk_size = chunk_size
+        self.codec = codec or get_codec()
+        self._lock = FileLock(path + LOCK_SUFFIX)
+        self._stamp: Optional[List[int]] = None
+        # Chunk id -> (file name, books) in collection order, and the chunk
+        # each loaded or added book is in, keyed by id(book).
+        self._chunks: Dict[int, Tuple[str, List[Book]]] = {}
+        self._chunk_of: Dict[int, int] = {}
+        self._next_file = 0
+
+    def lock(self):
+        return self._lock
+
+    def load(self) -> List[Book]:
+        self._stamp = _file_stamp(self.manifest_file)
+        self._chunks = {}
+        self._chunk_of = {}
+        self._next_file = 0
+        try:
+            with open(self.manifest_file, "rb") as f:
+                manifest = json.loads(f.read())
+            chunks = {}
+            for chunk_id, name in manifest["chunks"]:
+                with open(os.path.join(self.path, name), "rb") as f:
+                    data = f.read()
+                metrics.count("bytes_read", len(data))
+                chunks[chunk_id] = (name, self.codec.decode(data))
+            self._next_file = manifest["next_file"]
+        except FileNotFoundError:
+            if self._stamp is None:
+                return []
+            chunks = None
+        except (ValueError, KeyError, TypeError):
+            chunks = None
+        if chunks is None:
+            print(f"Warning: {self.path} is corrupted. Starting with empty collection.")
+            return []
+        self._chunks = chunks
+        books = []
+        for chunk_id, (_, chunk) in chunks.items():
+            for book in chunk:
+                self._chunk_of[id(book)] = chunk_id
+            books.extend(chunk)
+        return books
+
+    def replay(self) -> Iterator[Change]:
+        return iter(())
+
+    def changed(self) -> bool:
+        return _file_stamp(self.manifest_file) != self._stamp
+
+    def external_changes(self) -> Optional[List[Change]]:
+        return None
+
+    def view(self) -> Optional[Snapshot]:
+        return None
+
+    def _write_chunks(self, chunks: Dict[int, Tuple[str, List[Book]]], dirty: Iterable[int]):
+        """Write the dirty chunks to new files, then switch the manifest over to chunks."""
+        os.makedirs(self.path, exist_ok=True)
+        next_file = self._next_file
+        replaced = []
+        for chunk_id in dirty:
+            old_name, chunk = chunks[chunk_id]
+            if old_name:
+                replaced.append(old_name)
+            if not chunk:
+                del chunks[chunk_id]
+                continue
+            name = f"{next_file:08d}.json"
+            next_file += 1
+            _atomic_write(os.path.join(self.path, name), self.codec.encode(chunk))
+            chunks[chunk_id] = (name, chunk)
+        manifest = {"chunks": [[chunk_id, name] for chunk_id, (name, _) in chunks.items()],
+                    "next_file": next_file}
+        _atomic_write(self.manifest_file, json.dumps(manifest, separators=(",", ":")).encode())
+        self._stamp = _file_stamp(self.manifest_file)
+        self._chunks = chunks
+        self._next_file = next_file
+        for name in replaced:
+            try:
+                os.remove(os.path.join(self.path, name))
+            except FileNotFoundError:
+                pass
+
+    def save(self, books: Iterable[Book]):
+        books = list(books)
+        chunks = {}
+        chunk_of = {}
+        for chunk_id, start in enumerate(range(0, len(books), self.chunk_size)):
+            chunk = books[start:start + self.chunk_size]
+            chunks[chunk_id] = ("", chunk)
+            for book in chunk:
+                chunk_of[id(book)] = chunk_id
+        old = [name for name, _ in self._chunks.values()]
+        self._write_chunks(chunks, list(chunks))
+        self._chunk_of = chunk_of
+        for name in old:
+            try:
+                os.remove(os.path.join(self.path, name))
+            except FileNotFoundError:
+                pass
+
+    def commit(self, books: Iterable[Book], changes: List[Change]):
+        # Work on copies so a failed write leaves our chunk map matching disk.
+        chunks = dict(self._chunks)
+        placed: Dict[int, int] = {}
+        removed: List[int] = []
+        dirty = {}
+
+        def editable(chunk_id: int) -> List[Book]:
+            if chunk_id not in dirty:
+                name, chunk = chunks[chunk_id]
+                chunks[chunk_id] = (name, list(chunk))
+                dirty[chunk_id] = True
+            return chunks[chunk_id][1]
+
+        for op, book in changes:
+            if op == "add":
+                last = next(reversed(chunks), None)
+                if last is None or len(chunks[last][1]) >= self.chunk_size:
+                    last = 0 if last is None else max(chunks) + 1
+                    chunks[last] = ("", [])
+                editable(last).append(book)
+                placed[id(book)] = last
+            else:
+                chunk_id = placed.get(id(book))
+                if chunk_id is None:
+                    chunk_id = self._chunk_of[id(book)]
+                chunk = editable(chunk_id)
+                if op == "remove":
+                    _discard(chunk, book)
+                    removed.append(id(book))
+        self._write_chunks(chunks, list(dirty))
+        self._chunk_of.update(placed)
+        for key in removed:
+            self._chunk_of.pop(key, None)
+
+    def close(self):
+        pass
+
+
+class SqliteView:
+    """Read-only queries against the books table, answered from its indexes.
+
+    Offers the same lookups as a Snapshot; books read from it are copies.
+    """
+
+    COLUMNS = "SELECT title, author, year, read FROM books"
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+    @staticmethod
+    def _book(row: tuple) -> Book:
+        title, author, year, read = row
+        return Book(title, sys.intern(author), year, bool(read))
+
+    def __iter__(self) -> Iterator[Book]:
+        return map(self._book, self.conn.execute(self.COLUMNS + " ORDER BY id"))
+
+    def books(self) -> List[Book]:
+        return list(self)
+
+    def find_title(self, title: str) -> Optional[Book]:
+        """First book (in collection order) with this title, ignoring case."""
+        row = self.conn.execute(self.COLUMNS + " WHERE title_key = ? ORDER BY id LIMIT 1",
+                                (fold_key(title),)).fetchone()
+        return None if row is None else self._book(row)
+
+    def find_author(self, author: str) -> List[Book]:
+        """Every book by this author, in collection order, ignoring case."""
+        rows = self.conn.execute(self.COLUMNS + " WHERE author_key = ? ORDER BY id", (fold_key(author),))
+        return [self._book(row) for row in rows]
+
+    def close(self):
+        pass
+
+
+class SqliteStorage:
+    """Keep books in an SQLite database and write only the rows that change."""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS books (
+            id INTEGER PRIMARY KEY,
+            title TEXT NOT NULL,
+            author TEXT NOT NULL,
+            year INTEGER NOT NULL,
+            read INTEGER NOT NULL DEFAULT 0,
+            title_key TEXT NOT NULL,
+            author_key TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS books_title_key ON books (title_key);
+        CREATE INDEX IF NOT EXISTS books_author_key ON books (author_key);
+    """
+    INSERT = ("INSERT INTO books (id, title, author, year, read, title_key, author_key) "
+              "VALUES (?, ?, ?, ?, ?, ?, ?)")
+    UPDATE_READ = "UPDATE books SET read = ? WHERE id = ?"
+    DELETE = "DELETE FROM books WHERE id = ?"
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        # Row id of every loaded or added book, keyed by id(book).
+        self._rowids: Dict[int, int] = {}
+        self._data_version: Optional[int] = None
+
+    def lock(self):
+        # SQLite locks the database itself for the length of each transaction.
+        return nullcontext()
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            # Autocommit mode; writes are grouped with explicit transactions.
+            # Callers serialize access, so the server may commit from a worker thread.
+            conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(self.SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        conn = self.conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    @staticmethod
+    def _row(rowid: int, book: Book) -> tuple:
+        return (rowid, book.title, book.author, book.year, book.read,
+                fold_key(book.title), fold_key(book.author))
+
+    def load(self) -> List[Book]:
+        books = []
+        rowids = {}
+        for rowid, title, author, year, read in self.conn.execute(
+                "SELECT id, title, author, year, read FROM books ORDER BY id"):
+            book = Book(title, sys.intern(author), year, bool(read))
+            rowids[id(book)] = rowid
+            books.append(book)
+        self._rowids = rowids
+        self._data_version = self._current_data_version()
+        return books
+
+    def replay(self) -> Iterator[Change]:
+        return iter(())
+
+    def _current_data_version(self) -> int:
+        # Changes whenever another connection commits to the database.
+        return self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def changed(self) -> bool:
+        return self._current_data_version() != self._data_version
+
+    def external_changes(self) -> Optional[List[Change]]:
+        return None
+
+    def view(self) -> Optional[SqliteView]:
+        # Don't create an empty database just to look something up.
+        if self._conn is None and not os.path.exists(self.path):
+            return None
+        return SqliteView(self.conn)
+
+    def save(self, books: Iterable[Book]):
+        rowids = {}
+        rows = []
+        for rowid, book in enumerate(books, start=1):
+            rowids[id(book)] = rowid
+            rows.append(self._row(rowid, book))
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM books")
+            conn.executemany(self.INSERT, rows)
+        self._rowids = rowids
+
+    def commit(self, books: Iterable[Book], changes: List[Change]):
+        # Row ids are only updated once the transaction has committed, so a
+        # failed write leaves them matching the database.
+        added: Dict[int, int] = {}
+        removed: List[int] = []
+
+        def rowid(book: Book) -> int:
+            return added.get(id(book)) or self._rowids[id(book)]
+
+        with self._transaction() as conn:
+            for op, group in itertools.groupby(changes, key=itemgetter(0)):
+                run = [book for _, book in group]
+                if op == "add":
+                    next_id = conn.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM books").fetchone()[0]
+                    rows = []
+                    for offset, book in enumerate(run):
+                        added[id(book)] = next_id + offset
+                        rows.append(self._row(next_id + offset, book))
+                    conn.executemany(self.INSERT, rows)
+                elif op == "read":
+                    conn.executemany(self.UPDATE_READ, [(book.read, rowid(book)) for book in run])
+                elif op == "remove":
+                    conn.executemany(self.DELETE, [(rowid(book),) for book in run])
+                    removed.extend(id(book) for book in run)
+        self._rowids.update(added)
+        for key in removed:
+            self._rowids.pop(key, None)
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+def migrate_json_to_sqlite(json_path: str, db_path: str) -> int:
+    """Copy every book from a JSON snapshot into an SQLite database.
+
+    Any books already in the database are replaced. Returns how many books
+    were copied.
+    """
+    books = JsonStorage(json_path).load()
+    target = SqliteStorage(db_path)
+    try:
+        target.save(books)
+    finally:
+        target.close()
+    return len(books)
+
+
+def migrate_json_to_snapshot(json_path: str, snapshot_path: str) -> int:
+    """Write every book from a JSON snapshot into a binary one. Returns how many."""
+    books = JsonStorage(json_path).load()
+    SnapshotStorage(snapshot_path).save(books)
+    return len(books)
@@ -0,0 +1,185 @@
+import asyncio
+import json
+import subprocess
+import sys
+import os
+import threading
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+import books
+import book_app
+import metrics
+import daemon
+from books import BookCollection
+
+
+@pytest.fixture(autouse=True)
+def use_temp_collection(tmp_path, monkeypatch):
+    """Point the app at a fresh collection backed by a temporary data file."""
+    temp_file = tmp_path / "data.json"
+    temp_file.write_text("[]")
+    monkeypatch.setattr(books, "DATA_FILE", str(temp_file))
+    monkeypatch.setattr(book_app, "collection", BookCollection())
+
+
+def test_import_jsonl_skips_invalid_rows(tmp_path, capsys):
+    source = tmp_path / "books.jsonl"
+    source.write_text(
+        '{"title": "Dune", "author": "Frank Herbert", "year": 1965, "read": true}\n'
+        '{"title": "", "author": "Nobody", "year": 2000}\n'
+        'not json\n'
+        '{"title": "Emma", "author": "Jane Austen", "year": "1815"}\n'
+        '{"title": 5, "author": "H", "year": 1}\n'
+    )
+    book_app.handle_import([str(source)])
+    out = capsys.readouterr()
+    assert "Imported 2 books (3 skipped)" in out.out
+    assert "Line 2: Title is required." in out.err
+    assert "Line 3: Malformed row." in out.err
+    assert "Line 5: Invalid title: 5" in out.err
+
+    reloaded = BookCollection()
+    assert [b.title for b in reloaded.books] == ["Dune", "Emma"]
+    assert reloaded.find_book_by_title("Dune").read is True
+    assert reloaded.find_book_by_title("Emma").year == 1815
+
+def test_export_then_import_csv(tmp_path):
+    book_app.collection.add_book("Dune", "Frank Herbert", 1965)
+    book_app.collection.add_book("Emma", "Jane Austen", 1815, read=True)
+    target = tmp_path / "books.csv"
+    book_app.handle_export([str(target)])
+    assert target.read_text().splitlines()[0] == "title,author,year,read"
+
+    book_app.collection = BookCollection()
+    book_app.collection.remove_books(["Dune", "Emma"])
+    book_app.handle_import([str(target)])
+    assert [(b.title, b.read) for b in book_app.collection.books] == [("Dune", False), ("Emma", True)]
+
+def test_help_does_not_load_collection(monkeypatch, capsys):
+    monkeypatch.setattr(sys, "argv", ["book_app.py", "help"])
+    book_app.main()
+    monkeypatch.setattr(sys, "argv", ["book_app.py", "nope"])
+    book_app.main()
+    assert "Commands:" in capsys.readouterr().out
+    assert book_app.collection.loaded is False
+
+def test_search_command(capsys):
+    book_app.collection.add_book("The Hobbit", "J.R.R. Tolkien", 1937)
+    book_app.handle_search(["hobit"])
+    assert "The Hobbit by J.R.R. Tolkien (1937)" in capsys.readouterr().out
+
+def test_list_pages_sorted_books(capsys):
+    book_app.collection.add_books([
+        ("Dune", "Frank Herbert", 1965),
+        ("Emma", "Jane Austen", 1815),
+        ("Beloved", "Toni Morrison", 1987),
+    ])
+    book_app.handle_list(["--sort", "year", "--offset", "1", "--limit", "1"])
+    out = capsys.readouterr().out
+    assert "2. [ ] Dune by Frank Herbert (1965)" in out
+    assert "Emma" not in out and "Beloved" not in out
+
+    book_app.handle_list(["--sort", "title", "--format", "jsonl"])
+    lines = capsys.readouterr().out.splitlines()
+    assert [json.loads(line)["title"] for line in lines] == ["Beloved", "Dune", "Emma"]
+
+    book_app.handle_list(["--format", "json", "--limit", "2"])
+    assert [b["title"] for b in json.loads(capsys.readouterr().out)] == ["Dune", "Emma"]
+
+def test_list_exits_cleanly_on_broken_pipe(tmp_path):
+    data = tmp_path / "data.json"
+    data.write_text(json.dumps([
+        {"title": f"Book {i}", "author": "Someone", "year": 2000, "read": False}
+        for i in range(20000)
+    ]))
+    app = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "book_app.py")
+    proc = subprocess.Popen([sys.executable, app, "list"], cwd=tmp_path,
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    proc.stdout.readline()
+    proc.stdout.close()
+    assert proc.wait(timeout=30) in (0, 1)
+    assert b"Traceback" not in proc.stderr.read()
+
+def test_shell_runs_commands_until_exit(monkeypatch, capsys):
+    lines = iter(["list --bad-option", "add", "Dune", "Frank Herbert", "1965", "list", "exit"])
+    monkeypatch.setattr("builtins.input", lambda prompt="": next(lines))
+    book_app.handle_shell()
+    out = capsys.readouterr().out
+    assert "Book added successfully." in out
+    assert "1. [ ] Dune by Frank Herbert (1965)" in out
+
+def test_daemon_serves_client_requests(tmp_path):
+    socket_path = str(tmp_path / "books.sock")
+    loop = asyncio.new_event_loop()
+    server = loop.run_until_complete(daemon.start_server(book_app.collection, socket_path))
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    try:
+        with daemon.BookClient(socket_path) as client:
+            assert client.call("add", title="Dune", author="Frank Herbert", year=1965)["title"] == "Dune"
+            assert client.call("read", title="dune") is True
+            assert client.call("find", author="frank herbert")[0]["read"] is True
+            with pytest.raises(ValueError, match="Title is required"):
+                client.call("add", title="", author="Nobody", year=1)
+            with pytest.raises(ValueError, match="Unknown command"):
+                client.call("explode")
+            assert client.call("list", limit=5) == [
+                {"title": "Dune", "author": "Frank Herbert", "year": 1965, "read": True}]
+            storage = book_app.collection.storage
+            original_commit = storage.commit
+
+            def failing_commit(books, changes):
+                raise OSError("disk full")
+
+            storage.commit = failing_commit
+            try:
+                with pytest.raises(ValueError, match="disk full"):
+                    client.call("add", title="Emma", author="Jane Austen", year=1815)
+            finally:
+                storage.commit = original_commit
+            # The connection survives and the failed add was rolled back.
+            assert client.call("get", title="Emma") is None
+    finally:
+        async def shutdown():
+            server.close()
+            await server.wait_closed()
+            # Connection handlers finish once their client has hung up.
+            await asyncio.gather(*(asyncio.all_tasks() - {asyncio.current_task()}))
+
+        asyncio.run_coroutine_threadsafe(shutdown(), loop).result(timeout=5)
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout=5)
+        loop.close()
+    assert [b.title for b in BookCollection().books] == ["Dune"]
+
+
+def test_daemon_dispatch_coerces_command_line_strings():
+    collection = book_app.collection
+    assert daemon.dispatch(collection, {"command": "add", "title": "Dune",
+                                        "author": "Frank Herbert", "year": "1965",
+                                        "read": "false"})["read"] is False
+    daemon.dispatch(collection, {"command": "add", "title": "Emma",
+                                 "author": "Jane Austen", "year": "1815"})
+    assert [b["title"] for b in daemon.dispatch(
+        collection, {"command": "search", "query": "jane", "fields": "title,author"})] == ["Emma"]
+    assert daemon.dispatch(collection, {"command": "search", "query": "jane",
+                                        "fields": "title"}) == []
+
+def test_profile_reports_metrics_and_writes_pstats(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(sys, "argv", ["book_app.py", "--profile", "list"])
+    book_app.collection.add_book("Dune", "Frank Herbert", 1965)
+    book_app.collection = BookCollection()
+    try:
+        book_app.main()
+        report = capsys.readouterr().err
+        assert "Dune" not in report
+        data = json.loads(report[report.index("{"):])
+        assert report.endswith("}\n")
+        assert {"command", "load_books", "show_books"} <= set(data["timers"])
+        assert data["counters"]["bytes_read"] > 0
+        assert (tmp_path / "book_app-list.prof").exists()
+        assert 'book_app_duration_seconds_count{op="show_books"} 1' in metrics.render("prometheus")
+    finally:
+        metrics.reset()
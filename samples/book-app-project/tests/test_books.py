@@ -1,3 +1,4 @@
+import multiprocessing
 import sys
 import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -5,6 +6,10 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 import pytest
 import books
 from books import BookCollection
+import storage
+from storage import (ChunkedStorage, JournalStorage, JsonStorage, SnapshotStorage, SqliteStorage,
+                     migrate_json_to_sqlite)
+import codec
 
 
 @pytest.fixture(autouse=True)
@@ -51,3 +56,304 @@ def test_remove_book_invalid():
     collection = BookCollection()
     result = collection.remove_book("Nonexistent Book")
     assert result is False
+
+def test_journal_replays_changes():
+    collection = BookCollection(JournalStorage(books.DATA_FILE))
+    collection.add_book("Dune", "Frank Herbert", 1965)
+    collection.add_book("Emma", "Jane Austen", 1815)
+    collection.mark_as_read("Dune")
+    collection.remove_book("Emma")
+    assert open(books.DATA_FILE).read() == "[]"
+
+    reloaded = BookCollection(JournalStorage(books.DATA_FILE))
+    assert [b.title for b in reloaded.books] == ["Dune"]
+    assert reloaded.find_book_by_title("Dune").read is True
+
+def test_journal_compacts_past_threshold():
+    storage = JournalStorage(books.DATA_FILE, compact_threshold=1)
+    collection = BookCollection(storage)
+    collection.add_book("Dune", "Frank Herbert", 1965)
+    assert not os.path.exists(storage.journal_file)
+
+    reloaded = BookCollection(JournalStorage(books.DATA_FILE))
+    assert [b.title for b in reloaded.books] == ["Dune"]
+
+def test_journal_ignored_after_snapshot_replaced():
+    collection = BookCollection(JournalStorage(books.DATA_FILE))
+    collection.add_book("Dune", "Frank Herbert", 1965)
+    with open(books.DATA_FILE, "w") as f:
+        f.write('[{"title": "Emma", "author": "Jane Austen", "year": 1815, "read": false}]')
+
+    reloaded = BookCollection(JournalStorage(books.DATA_FILE))
+    assert [b.title for b in reloaded.books] == ["Emma"]
+
+def test_journal_commits_after_stale_log_or_torn_tail_are_replayed():
+    collection = BookCollection(JournalStorage(books.DATA_FILE))
+    collection.add_book("Dune", "Frank Herbert", 1965)
+    with open(books.DATA_FILE + ".log", "a") as f:
+        f.write('{"op": "add", "book": {"title": "Torn')
+    second = BookCollection(JournalStorage(books.DATA_FILE))
+    second.add_book("Emma", "Jane Austen", 1815)
+    assert [b.title for b in BookCollection(JournalStorage(books.DATA_FILE)).books] == ["Dune", "Emma"]
+
+    with open(books.DATA_FILE, "w") as f:
+        f.write("[]")
+    third = BookCollection(JournalStorage(books.DATA_FILE))
+    third.add_book("Ulysses", "James Joyce", 1922)
+    assert [b.title for b in BookCollection(JournalStorage(books.DATA_FILE)).books] == ["Ulysses"]
+
+def test_find_by_author_ignores_case():
+    collection = BookCollection()
+    collection.add_book("Dune", "Frank Herbert", 1965)
+    collection.add_book("Children of Dune", "FRANK HERBERT", 1976)
+    collection.add_book("Emma", "Jane Austen", 1815)
+    titles = [b.title for b in collection.find_by_author("frank herbert")]
+    assert titles == ["Dune", "Children of Dune"]
+
+def test_remove_duplicate_title_keeps_other_copy():
+    collection = BookCollection()
+    first = collection.add_book("Dune", "Frank Herbert", 1965)
+    second = collection.add_book("dune", "Frank Herbert", 1965)
+    assert collection.find_book_by_title("DUNE") is first
+    collection.remove_book("Dune")
+    assert collection.find_book_by_title("Dune") is second
+    assert collection.find_by_author("Frank Herbert") == [second]
+
+def test_batch_saves_once(monkeypatch):
+    collection = BookCollection()
+    saves = []
+    monkeypatch.setattr(collection.storage, "commit", lambda books, changes: saves.append(len(list(books))))
+    collection.add_books([("Dune", "Frank Herbert", 1965), ("Emma", "Jane Austen", 1815)])
+    assert saves == [2]
+    assert collection.mark_many_as_read(["Dune", "Missing"]) == 1
+    assert collection.remove_books(["Emma"]) == 1
+    assert saves == [2, 2, 1]
+
+def test_batch_rolls_back_on_error():
+    collection = BookCollection()
+    collection.add_book("Dune", "Frank Herbert", 1965)
+    with pytest.raises(RuntimeError):
+        with collection.batch():
+            collection.add_book("Emma", "Jane Austen", 1815)
+            collection.mark_as_read("Dune")
+            collection.remove_book("Dune")
+            raise RuntimeError("boom")
+    assert [b.title for b in collection.books] == ["Dune"]
+    assert collection.find_book_by_title("Dune").read is False
+    assert collection.find_book_by_title("Emma") is None
+    assert [b.title for b in BookCollection().books] == ["Dune"]
+
+def test_add_book_validates_fields():
+    collection = BookCollection()
+    with pytest.raises(ValueError):
+        collection.add_book("  ", "George Orwell", 1949)
+    with pytest.raises(ValueError):
+        collection.add_book("1984", "George Orwell", "nineteen")
+    book = collection.add_book(" 1984 ", "George Orwell", "1949")
+    assert (book.title, book.year) == ("1984", 1949)
+    assert len(collection.books) == 1
+
+def test_books_are_slotted_and_share_author_strings():
+    collection = BookCollection()
+    collection.add_book("Dune", "Frank Herbert", 1965)
+    collection.add_book("Children of Dune", "".join(["Frank ", "Herbert"]), 1976)
+    first, second = BookCollection().books
+    assert not hasattr(first, "__dict__")
+    assert first.author is second.author
+
+def test_sqlite_storage_round_trip(tmp_path):
+    db = str(tmp_path / "books.db")
+    collection = BookCollection(SqliteStorage(db))
+    collection.add_books([("Dune", "Frank Herbert", 1965), ("Emma", "Jane Austen", 1815)])
+    collection.mark_as_read("Emma")
+    collection.remove_book("Dune")
+    collection.add_book("Beloved", "Toni Morrison", 1987)
+
+    reloaded = BookCollection(SqliteStorage(db))
+    assert [(b.title, b.read) for b in reloaded.books] == [("Emma", True), ("Beloved", False)]
+
+def test_migrate_json_to_sqlite(tmp_path):
+    collection = BookCollection()
+    collection.add_book("Dune", "Frank Herbert", 1965, read=True)
+    db = str(tmp_path / "books.db")
+    assert migrate_json_to_sqlite(books.DATA_FILE, db) == 1
+    assert BookCollection(SqliteStorage(db)).books == collection.books
+
+def test_search_ranks_exact_prefix_substring_and_typos():
+    collection = BookCollection()
+    collection.add_books([
+        ("Children of Dune", "Frank Herbert", 1976),
+        ("Dunes of Mars", "Ann Other", 2001),
+        ("Dune", "Frank Herbert", 1965),
+        ("The Hobbit", "J.R.R. Tolkien", 1937),
+    ])
+    assert [b.title for b in collection.search("DUNE")] == ["Dune", "Dunes of Mars", "Children of Dune"]
+    assert [b.title for b in collection.search("hobit")] == ["The Hobbit"]
+    assert [b.title for b in collection.search("herbert", fields=["author"], limit=1)] == ["Children of Dune"]
+
+def test_search_finds_short_substrings():
+    collection = BookCollection()
+    collection.add_books([
+        ("Dune", "Frank Herbert", 1965),
+        ("Children of Dune", "Frank Herbert", 1976),
+        ("The Hobbit", "J.R.R. Tolkien", 1937),
+    ])
+    assert [b.title for b in collection.search("un", fields=["title"])] == ["Dune", "Children of Dune"]
+    assert [b.title for b in collection.search("ob", fields=["title"])] == ["The Hobbit"]
+    assert [b.title for b in collection.search("d", fields=["title"])] == ["Dune", "Children of Dune"]
+
+def test_search_index_follows_changes():
+    collection = BookCollection()
+    collection.add_book("Dune", "Frank Herbert", 1965)
+    assert len(collection.search("dune")) == 1
+    collection.add_book("Dune Messiah", "Frank Herbert", 1969)
+    collection.remove_book("Dune")
+    assert [b.title for b in collection.search("dune")] == ["Dune Messiah"]
+
+def _chunked(path):
+    return ChunkedStorage(path + ".d", chunk_size=2)
+
+@pytest.mark.parametrize("make_storage", [JsonStorage, JournalStorage, _chunked])
+def test_concurrent_writers_merge_instead_of_overwriting(make_storage):
+    first = BookCollection(make_storage(books.DATA_FILE))
+    second = BookCollection(make_storage(books.DATA_FILE))
+    first.add_book("Dune", "Frank Herbert", 1965)
+    second.add_book("Emma", "Jane Austen", 1815)
+    first.mark_as_read("Emma")
+    assert [b.title for b in second.books] == ["Dune", "Emma"]
+    assert second.refresh() is True
+    assert second.find_book_by_title("Emma").read is True
+
+    reloaded = BookCollection(make_storage(books.DATA_FILE))
+    assert [(b.title, b.read) for b in reloaded.books] == [("Dune", False), ("Emma", True)]
+
+@pytest.mark.parametrize("make_storage", [JsonStorage, JournalStorage, _chunked])
+def test_concurrent_writers_agree_on_case_insensitive_duplicate_titles(make_storage):
+    first = BookCollection(make_storage(books.DATA_FILE))
+    second = BookCollection(make_storage(books.DATA_FILE))
+    first.load_books()
+    second.add_book("Dune", "Frank Herbert", 1965)
+    first.add_book("dune", "Someone Else", 2001)
+    assert first.remove_book("Dune")
+
+    with first.batch():
+        first.add_book("Emma", "Jane Austen", 1815)
+        second.add_book("emma", "Someone Else", 2002)
+        second.mark_as_read("Emma")
+        first.mark_as_read("emma")
+
+    def state(collection):
+        return [(b.title, b.author, b.read) for b in collection.books]
+
+    reloaded = BookCollection(make_storage(books.DATA_FILE))
+    assert state(first) == state(reloaded)
+    assert second.refresh() is True
+    assert state(second) == state(reloaded)
+
+def _sqlite(path):
+    return SqliteStorage(path + ".db")
+
+@pytest.mark.parametrize("make_storage", [JsonStorage, JournalStorage, _sqlite])
+def test_failed_write_undoes_only_that_change(make_storage):
+    collection = BookCollection(make_storage(books.DATA_FILE))
+    collection.add_books([("Dune", "Frank Herbert", 1965), ("Emma", "Jane Austen", 1815),
+                          ("Ulysses", "James Joyce", 1922)])
+    before = [(b.title, b.read) for b in collection.books]
+
+    def failing_commit(books, changes):
+        raise OSError("disk full")
+
+    original_commit = collection.storage.commit
+    collection.storage.commit = failing_commit
+    for change in (lambda: collection.add_book("Beloved", "Toni Morrison", 1987),
+                   lambda: collection.mark_as_read("Emma"),
+                   lambda: collection.remove_book("Emma")):
+        with pytest.raises(OSError):
+            change()
+        assert [(b.title, b.read) for b in collection.books] == before
+    collection.storage.commit = original_commit
+    assert collection.mark_as_read("Emma")
+    assert [(b.title, b.read) for b in BookCollection(make_storage(books.DATA_FILE)).books] == \
+        [("Dune", False), ("Emma", True), ("Ulysses", False)]
+
+@pytest.mark.parametrize("name", ["json", "orjson", "msgspec"])
+def test_codecs_read_each_others_snapshots(name):
+    if name != "json" and getattr(codec, name) is None:
+        pytest.skip(f"{name} not installed")
+    written = JsonStorage(books.DATA_FILE, codec=codec.get_codec(name))
+    written.save([books.Book("Dune", "Frank Herbert", 1965, True)])
+    with open(books.DATA_FILE) as f:
+        assert "\n" not in f.read()
+    loaded = JsonStorage(books.DATA_FILE, codec=codec.get_codec("json")).load()
+    assert loaded == [books.Book("Dune", "Frank Herbert", 1965, True)]
+
+def test_chunked_storage_rewrites_only_touched_chunks(tmp_path):
+    path = str(tmp_path / "books.d")
+    collection = BookCollection(ChunkedStorage(path, chunk_size=2))
+    collection.add_books([("Dune", "Frank Herbert", 1965), ("Emma", "Jane Austen", 1815),
+                          ("Ulysses", "James Joyce", 1922), ("Beloved", "Toni Morrison", 1987)])
+    before = sorted(os.listdir(path))
+    assert len(before) == 3  # two chunks and the manifest
+
+    collection.mark_as_read("Ulysses")
+    after = sorted(os.listdir(path))
+    # Only the Ulysses/Beloved chunk was written again.
+    assert set(after) - set(before) == {"00000002.json"}
+    assert set(before) - set(after) == {"00000001.json"}
+    collection.remove_book("Dune")
+    collection.remove_book("Emma")
+    collection.add_book("Middlemarch", "George Eliot", 1871)
+
+    reloaded = BookCollection(ChunkedStorage(path, chunk_size=2))
+    assert [(b.title, b.read) for b in reloaded.books] == [
+        ("Ulysses", True), ("Beloved", False), ("Middlemarch", False)]
+    assert len(os.listdir(path)) == 3
+
+@pytest.mark.parametrize("make_storage, name", [(SnapshotStorage, "books.snap"), (SqliteStorage, "books.db")])
+def test_lookups_are_answered_without_loading(tmp_path, make_storage, name):
+    path = str(tmp_path / name)
+    assert BookCollection(make_storage(path)).find_by_author("Anyone") == []
+
+    writer = BookCollection(make_storage(path))
+    writer.add_books([("Émile", "Jean-Jacques Rousseau", 1762), ("Dune", "Frank Herbert", 1965),
+                      ("dune", "Someone Else", 2000)])
+    writer.mark_as_read("Dune")
+
+    reader = BookCollection(make_storage(path))
+    assert reader.find_book_by_title("DUNE") == books.Book("Dune", "Frank Herbert", 1965, True)
+    assert reader.find_book_by_title("émile").author == "Jean-Jacques Rousseau"
+    assert reader.find_book_by_title("Missing") is None
+    assert [b.title for b in reader.iter_books()] == ["Émile", "Dune", "dune"]
+    assert reader.find_by_author("frank HERBERT") == [books.Book("Dune", "Frank Herbert", 1965, True)]
+    assert reader.find_by_author("Nobody") == []
+    assert reader.loaded is False
+
+    writer.remove_book("Émile")
+    assert [b.title for b in reader.list_books()] == ["Dune", "dune"]
+    reader.add_book("Emma", "Jane Austen", 1815)
+    assert reader.loaded is True
+    assert [b.title for b in BookCollection(make_storage(path)).books] == ["Dune", "dune", "Emma"]
+
+def test_journal_picks_up_only_new_records(monkeypatch):
+    first = BookCollection(JournalStorage(books.DATA_FILE))
+    second = BookCollection(JournalStorage(books.DATA_FILE))
+    second.load_books()
+    first.add_book("Dune", "Frank Herbert", 1965)
+    monkeypatch.setattr(second.storage, "load", lambda: pytest.fail("full reload"))
+    assert second.refresh() is True
+    assert [b.title for b in second.books] == ["Dune"]
+
+def _add_many(path, worker):
+    collection = BookCollection(JournalStorage(path))
+    for i in range(20):
+        collection.add_book(f"Book {worker}-{i}", "Someone", 2000)
+
+@pytest.mark.skipif(storage.fcntl is None, reason="needs fcntl file locks")
+def test_processes_share_journal_without_lost_updates():
+    ctx = multiprocessing.get_context("fork")
+    workers = [ctx.Process(target=_add_many, args=(books.DATA_FILE, w)) for w in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert len(BookCollection(JournalStorage(books.DATA_FILE)).books) == 80
@@ -0,0 +1,149 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+import json
+import threading
+
+import pytest
+import books
+from books import BookCollection
+from server import BookServer
+
+
+@pytest.fixture(autouse=True)
+def use_temp_data_file(tmp_path, monkeypatch):
+    """Use a temporary data file for each test."""
+    temp_file = tmp_path / "data.json"
+    temp_file.write_text("[]")
+    monkeypatch.setattr(books, "DATA_FILE", str(temp_file))
+
+
+async def call(port, method, path, body=None):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    data = json.dumps(body).encode() if body is not None else b""
+    writer.write(f"{method} {path} HTTP/1.1\r\nConnection: close\r\n"
+                 f"Content-Length: {len(data)}\r\n\r\n".encode() + data)
+    response = await reader.read()
+    writer.close()
+    head, _, payload = response.partition(b"\r\n\r\n")
+    return int(head.split()[1]), json.loads(payload)
+
+
+def run_server(collection, scenario, **options):
+    async def main():
+        app = BookServer(collection, **options)
+        server = await app.start("127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            return await scenario(port)
+        finally:
+            server.close()
+            await server.wait_closed()
+            await app.stop()
+
+    return asyncio.run(main())
+
+
+def test_routes():
+    async def scenario(port):
+        assert await call(port, "POST", "/books", {"title": "Dune", "author": "Frank Herbert", "year": 1965}) \
+            == (201, {"title": "Dune", "author": "Frank Herbert", "year": 1965, "read": False})
+        assert (await call(port, "POST", "/books", {"title": "", "author": "X", "year": 1}))[0] == 400
+        assert (await call(port, "POST", "/books/dune/read"))[1]["read"] is True
+        assert (await call(port, "GET", "/books/DUNE"))[1]["title"] == "Dune"
+        assert [b["title"] for b in (await call(port, "GET", "/books?author=frank%20herbert"))[1]] == ["Dune"]
+        assert [b["title"] for b in (await call(port, "GET", "/books?q=dnue"))[1]] == ["Dune"]
+        assert (await call(port, "DELETE", "/books/Dune"))[0] == 200
+        assert (await call(port, "DELETE", "/books/Dune"))[0] == 404
+        assert (await call(port, "GET", "/nothing"))[0] == 404
+        assert await call(port, "GET", "/books") == (200, [])
+
+    run_server(BookCollection(), scenario)
+
+def test_marking_a_book_removed_in_the_same_batch_is_not_an_error():
+    collection = BookCollection()
+    titles = [f"Book{i}" for i in range(20)]
+    collection.add_books((title, "Someone", 2000) for title in titles)
+
+    async def scenario(port):
+        responses = await asyncio.gather(*(
+            call(port, method, f"/books/{title}{suffix}")
+            for title in titles for method, suffix in (("POST", "/read"), ("DELETE", ""))
+        ))
+        assert {status for status, _ in responses} <= {200, 404}
+        assert await call(port, "GET", "/books") == (200, [])
+
+    run_server(collection, scenario)
+
+def test_concurrent_writes_share_saves(monkeypatch):
+    collection = BookCollection()
+    commits = []
+    original = collection.storage.commit
+    monkeypatch.setattr(collection.storage, "commit",
+                        lambda books, changes: (commits.append(len(changes)), original(books, changes)))
+
+    async def scenario(port):
+        responses = await asyncio.gather(*(
+            call(port, "POST", "/books", {"title": f"Book {i}", "author": "Someone", "year": 2000})
+            for i in range(50)
+        ))
+        assert all(status == 201 for status, _ in responses)
+
+    run_server(collection, scenario)
+    assert sum(commits) == 50
+    assert len(commits) < 50
+    assert len(BookCollection().books) == 50
+
+
+def test_reads_are_answered_while_a_save_runs(monkeypatch):
+    collection = BookCollection()
+    collection.add_book("Emma", "Jane Austen", 1815)
+    release = threading.Event()
+    original = collection.storage.commit
+
+    def slow_commit(books, changes):
+        release.wait(5)
+        original(books, changes)
+
+    monkeypatch.setattr(collection.storage, "commit", slow_commit)
+
+    async def scenario(port):
+        write = asyncio.ensure_future(
+            call(port, "POST", "/books", {"title": "Dune", "author": "Frank Herbert", "year": 1965}))
+        await asyncio.sleep(0.1)
+        assert (await call(port, "GET", "/books/emma"))[0] == 200
+        assert not write.done()
+        release.set()
+        assert (await write)[0] == 201
+
+    run_server(collection, scenario)
+    assert [b.title for b in BookCollection().books] == ["Emma", "Dune"]
+
+
+def test_failed_save_rolls_back(monkeypatch):
+    collection = BookCollection()
+
+    def failing_commit(books, changes):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(collection.storage, "commit", failing_commit)
+
+    async def scenario(port):
+        assert (await call(port, "POST", "/books", {"title": "Dune", "author": "Frank Herbert", "year": 1965}))[0] == 500
+        assert (await call(port, "GET", "/books"))[1] == []
+
+    run_server(collection, scenario)
+
+
+def test_picks_up_changes_saved_by_other_processes():
+    async def scenario(port):
+        BookCollection().add_book("Dune", "Frank Herbert", 1965)
+        for _ in range(50):
+            if (await call(port, "GET", "/books/dune"))[0] == 200:
+                return
+            await asyncio.sleep(0.02)
+        raise AssertionError("server never saw the new book")
+
+    run_server(BookCollection(), scenario, refresh_interval=0.05)
@@ -0,0 +1,124 @@
+"""Compare get_user calls/sec with a connection per call vs the shared pool.
+
+Usage: python benchmarks/bench_db.py [--users 10000] [--calls 20000] [--threads 4] [--bulk-rows 5000]
+
+Then time creating, reading, renaming and deleting --bulk-rows users one call
+at a time against the chunked create_users/get_users/update_users/delete_users.
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import user_service  # noqa: E402
+from db import ConnectionPool  # noqa: E402
+
+
+def make_db(path, users):
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT, email TEXT, password TEXT)")
+    conn.executemany("INSERT INTO users (name, email, password) VALUES (?, ?, ?)",
+                     ((f"User {i}", f"user{i}@example.com", "secret") for i in range(users)))
+    conn.commit()
+    conn.close()
+
+
+def connect_per_call(path):
+    """The old get_user: a new connection for every lookup, never closed."""
+    def get_user(user_id):
+        conn = sqlite3.connect(path)
+        return conn.execute("SELECT * FROM users WHERE id = ?", (user_id,)).fetchone()
+    return get_user
+
+
+def calls_per_sec(get_user, ids, threads):
+    chunks = [ids[i::threads] for i in range(threads)]
+
+    def worker(chunk):
+        for user_id in chunk:
+            get_user(user_id)
+
+    workers = [threading.Thread(target=worker, args=(chunk,)) for chunk in chunks]
+    start = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    return len(ids) / (time.perf_counter() - start)
+
+
+def rows_per_sec(func, count):
+    start = time.perf_counter()
+    func()
+    return count / (time.perf_counter() - start)
+
+
+def compare_bulk(count):
+    """Rows/sec for each single-row call in a loop vs its bulk version."""
+    users = [{"name": f"Bulk {i}", "email": f"bulk{i}@example.com", "password": "secret"}
+             for i in range(count)]
+
+    def create_loop():
+        for user in users[:count // 2]:
+            user_service.create_user(user)
+
+    def new_ids():
+        return [row["id"] for row in user_service.db.query_all(
+            "SELECT id FROM users WHERE email LIKE 'bulk%' ORDER BY id")]
+
+    before = rows_per_sec(create_loop, count // 2)
+    after = rows_per_sec(lambda: user_service.create_users(users[count // 2:]), count - count // 2)
+    yield "create", before, after
+
+    ids = new_ids()
+    half = len(ids) // 2
+    before = rows_per_sec(lambda: [user_service.get_user(i) for i in ids[:half]], half)
+    after = rows_per_sec(lambda: user_service.get_users(ids[half:]), len(ids) - half)
+    yield "get", before, after
+
+    renames = {user_id: {"name": f"Renamed {user_id}"} for user_id in ids}
+    before = rows_per_sec(lambda: [user_service.update_user(i, renames[i]) for i in ids[:half]], half)
+    after = rows_per_sec(lambda: user_service.update_users({i: renames[i] for i in ids[half:]}),
+                         len(ids) - half)
+    yield "update", before, after
+
+    before = rows_per_sec(lambda: [user_service.delete_user(i) for i in ids[:half]], half)
+    after = rows_per_sec(lambda: user_service.delete_users(ids[half:]), len(ids) - half)
+    yield "delete", before, after
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--calls", type=int, default=20_000)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--bulk-rows", type=int, default=5000)
+    options = parser.parse_args()
+
+    rng = random.Random(0)
+    ids = [rng.randint(1, options.users) for _ in range(options.calls)]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "users.db")
+        make_db(path, options.users)
+        user_service.db = ConnectionPool(path)
+        print(f"{options.calls:,} get_user calls on {options.users:,} users")
+        for threads in (1, options.threads):
+            before = calls_per_sec(connect_per_call(path), ids, threads)
+            after = calls_per_sec(user_service.get_user, ids, threads)
+            print(f"  {threads} thread(s): connect per call {before:10,.0f}/s   "
+                  f"pooled {after:10,.0f}/s   ({after / before:.1f}x)")
+        print(f"{options.bulk_rows:,} rows, half one call at a time and half in bulk")
+        for op, before, after in compare_bulk(options.bulk_rows):
+            print(f"  {op:8} loop {before:10,.0f} rows/s   bulk {after:10,.0f} rows/s   ({after / before:.1f}x)")
+        user_service.db.close_all()
+
+
+if __name__ == "__main__":
+    main()
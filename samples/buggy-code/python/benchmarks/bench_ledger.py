@@ -0,0 +1,107 @@
+"""Stress the ledger with concurrent withdrawals and check nothing is overdrawn.
+
+Usage: python benchmarks/bench_ledger.py [--accounts 1000] [--withdrawals 50000] [--delay-ms 1]
+
+Every withdrawal awaits a simulated network call between the balance check
+and the debit. The old check-then-await-then-write pattern is run the same
+way for comparison and overdraws; the ledger must not, and because accounts
+are locked separately it should take far less time than one global lock.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ledger import InsufficientFunds, Ledger  # noqa: E402
+
+START_CENTS = 10_000
+
+
+class GlobalLockLedger(Ledger):
+    """Every account shares one lock, so all withdrawals are serialized."""
+
+    def __init__(self):
+        super().__init__()
+        self._global = asyncio.Lock()
+
+    def _lock(self, account_id):
+        return self._global
+
+
+def plan(accounts, withdrawals, seed=0):
+    rng = random.Random(seed)
+    return [(rng.randrange(accounts), rng.randint(1, 2_500)) for _ in range(withdrawals)]
+
+
+async def run_unlocked(accounts, requests, delay):
+    """The old withdraw(): check, await, then write."""
+    balances = dict.fromkeys(range(accounts), START_CENTS)
+
+    async def withdraw(account, cents):
+        if balances[account] >= cents:
+            await asyncio.sleep(delay)
+            balances[account] -= cents
+
+    start = time.perf_counter()
+    await asyncio.gather(*(withdraw(a, c) for a, c in requests))
+    return time.perf_counter() - start, balances, None
+
+
+async def run_ledger(ledger, accounts, requests, delay):
+    for account in range(accounts):
+        ledger.open_account(account, START_CENTS)
+    debited = dict.fromkeys(range(accounts), 0)
+
+    async def withdraw(account, cents):
+        try:
+            await ledger.withdraw(account, cents, authorize=lambda: asyncio.sleep(delay))
+        except InsufficientFunds:
+            return
+        debited[account] += cents
+
+    start = time.perf_counter()
+    await asyncio.gather(*(withdraw(a, c) for a, c in requests))
+    balances = {account: ledger.balance(account) for account in range(accounts)}
+    return time.perf_counter() - start, balances, debited
+
+
+def report(name, elapsed, balances, debited, withdrawals):
+    overdrawn = sum(1 for b in balances.values() if b < 0)
+    consistent = debited is None or all(START_CENTS - debited[a] == b for a, b in balances.items())
+    print(f"  {name:18} {elapsed * 1000:9.1f} ms  {withdrawals / elapsed:10,.0f} withdrawals/s  "
+          f"overdrawn accounts: {overdrawn}  balances add up: {consistent}")
+    return overdrawn == 0 and consistent
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--accounts", type=int, default=1000)
+    parser.add_argument("--withdrawals", type=int, default=50_000)
+    parser.add_argument("--delay-ms", type=float, default=1.0)
+    options = parser.parse_args()
+
+    requests = plan(options.accounts, options.withdrawals)
+    delay = options.delay_ms / 1000
+    print(f"{options.withdrawals:,} concurrent withdrawals over {options.accounts:,} accounts "
+          f"({options.delay_ms} ms simulated network call each)")
+    report("check-await-write", *asyncio.run(run_unlocked(options.accounts, requests, delay)),
+           options.withdrawals)
+    ok = report("per-account locks", *asyncio.run(run_ledger(Ledger(), options.accounts, requests, delay)),
+                options.withdrawals)
+    # A single lock serializes every call, so run it on a slice and scale up.
+    sample = requests[:max(1, options.withdrawals // 50)]
+    elapsed, balances, debited = asyncio.run(run_ledger(GlobalLockLedger(), options.accounts, sample, delay))
+    ok &= report("one global lock", elapsed * len(requests) / len(sample), balances, debited,
+                 options.withdrawals)
+    print("  (global lock time extrapolated from a 2% sample)")
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
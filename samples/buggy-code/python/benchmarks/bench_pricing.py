@@ -0,0 +1,69 @@
+"""Compare pricing carts one at a time with the batch cart_totals() API.
+
+Usage: python benchmarks/bench_pricing.py [--items 1000000] [--carts 100000]
+
+All paths must produce exactly the same total for every cart.
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pricing  # noqa: E402
+from pricing import cart_total_cents, cart_totals  # noqa: E402
+
+
+def make_items(items, carts, seed=0):
+    rng = random.Random(seed)
+    cart_ids = [rng.randrange(carts) for _ in range(items)]
+    prices = [rng.randint(1, 50_000) for _ in range(items)]
+    quantities = [rng.randint(1, 10) for _ in range(items)]
+    return cart_ids, prices, quantities
+
+
+def timed(label, items, func):
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    print(f"  {label:26} {elapsed * 1000:9.1f} ms  {items / elapsed:14,.0f} items/s")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=1_000_000)
+    parser.add_argument("--carts", type=int, default=100_000)
+    options = parser.parse_args()
+
+    cart_ids, prices, quantities = make_items(options.items, options.carts)
+    carts = {}
+    for cart, price, quantity in zip(cart_ids, prices, quantities):
+        carts.setdefault(cart, []).append({"price": f"{price // 100}.{price % 100:02d}",
+                                           "quantity": quantity})
+
+    print(f"{options.items:,} line items in {len(carts):,} carts")
+    expected = timed("calculate_total per cart", options.items,
+                     lambda: {cart: cart_total_cents(items) for cart, items in carts.items()})
+    results = {"python": timed("cart_totals (python)", options.items,
+                               lambda: cart_totals(cart_ids, prices, quantities, backend="python"))}
+    if pricing.np is not None:
+        np = pricing.np
+        columns = (np.array(cart_ids), np.array(prices, dtype=np.int64), np.array(quantities, dtype=np.int64))
+        results["numpy"] = timed("cart_totals (numpy)", options.items,
+                                 lambda: cart_totals(*columns, backend="numpy"))
+    else:
+        print("  (numpy not installed, skipped)")
+
+    for backend, totals in results.items():
+        if totals != expected:
+            print(f"FAIL: {backend} totals differ from calculate_total")
+            sys.exit(1)
+    print("  all totals match")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Compare looking up receipts one connection and query at a time with ReceiptRepository.
+
+Usage: python benchmarks/bench_receipts.py [--receipts 100000] [--lookups 2000]
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db import ConnectionPool  # noqa: E402
+from receipts import ReceiptRepository  # noqa: E402
+
+
+def make_db(path, count):
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE receipts (id TEXT, amount_cents INTEGER, created_at TEXT)")
+    conn.executemany("INSERT INTO receipts VALUES (?, ?, ?)",
+                     ((f"rcpt_{i:08d}", i % 10_000, f"2024-{i % 12 + 1:02d}-{i % 28 + 1:02d}")
+                      for i in range(count)))
+    conn.commit()
+    conn.close()
+
+
+def old_get_receipt(path, receipt_id):
+    """The old get_receipt: a new connection and an unindexed query per id."""
+    conn = sqlite3.connect(path)
+    return conn.execute(f"SELECT * FROM receipts WHERE id = '{receipt_id}'").fetchone()
+
+
+def timed(label, count, func):
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    print(f"  {label:30} {elapsed * 1000:9.1f} ms  {count / elapsed:12,.0f} receipts/s")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--receipts", type=int, default=100_000)
+    parser.add_argument("--lookups", type=int, default=2000)
+    options = parser.parse_args()
+
+    rng = random.Random(0)
+    ids = [f"rcpt_{rng.randrange(options.receipts):08d}" for _ in range(options.lookups)]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "payments.db")
+        make_db(path, options.receipts)
+        print(f"{options.lookups:,} lookups in {options.receipts:,} receipts")
+        old = timed("get_receipt loop (before)", len(ids), lambda: [old_get_receipt(path, i) for i in ids])
+
+        pool = ConnectionPool(path)
+        repo = ReceiptRepository(pool)
+        timed("ensure_indexes (once)", options.receipts, repo.ensure_indexes)
+        single = timed("repo.get loop", len(ids), lambda: [repo.get(i) for i in ids])
+        many = timed("repo.get_many", len(ids), lambda: repo.get_many(ids))
+        march = timed("repo.iter_range (March)", options.receipts // 12,
+                      lambda: sum(1 for _ in repo.iter_range("2024-03-01", "2024-04-01")))
+        pool.close_all()
+
+    if [tuple(r) for r in single] != [tuple(r) for r in old] or \
+            any(tuple(many[i]) != tuple(r) for i, r in zip(ids, old)):
+        print("FAIL: results differ")
+        sys.exit(1)
+    print(f"  all lookups match ({march:,} receipts in March)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+# db.py - Shared SQLite connections for user_service
+#
+# Each thread gets its own connection (sqlite3 connections shouldn't be used
+# from two threads at once), opened on first use and then reused, instead of
+# connecting on every call. Connections use WAL so readers don't block the
+# writer, and sqlite3 keeps prepared statements for repeated parameterized
+# queries in a per-connection cache. A thread's connection is closed when the
+# thread exits, so short-lived worker threads don't leave connections open.
+
+import sqlite3
+import threading
+import weakref
+from contextlib import contextmanager
+
+STATEMENT_CACHE_SIZE = 256
+
+
+class _ThreadConnection:
+    """Holds one thread's connection and closes it once the thread-local is dropped."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.close = weakref.finalize(self, conn.close)
+
+
+class ConnectionPool:
+    def __init__(self, path, timeout=5.0):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        # Weak, so a holder is forgotten when its thread exits.
+        self._holders = weakref.WeakSet()
+
+    def connection(self):
+        """This thread's connection, opened on first use."""
+        holder = getattr(self._local, "holder", None)
+        if holder is None:
+            # Autocommit mode: transactions are started explicitly below.
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None,
+                                   check_same_thread=False, cached_statements=STATEMENT_CACHE_SIZE)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            holder = self._local.holder = _ThreadConnection(conn)
+            with self._lock:
+                self._holders.add(holder)
+        return holder.conn
+
+    def query_one(self, sql, params=()):
+        return self.connection().execute(sql, params).fetchone()
+
+    def query_all(self, sql, params=()):
+        return self.connection().execute(sql, params).fetchall()
+
+    @contextmanager
+    def transaction(self):
+        """Run the block in one write transaction, rolled back if it raises."""
+        conn = self.connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def close_all(self):
+        """Close every thread's connection; threads reconnect on next use."""
+        with self._lock:
+            holders = list(self._holders)
+            self._holders = weakref.WeakSet()
+        for holder in holders:
+            holder.close()
+        self._local = threading.local()
+
+    def open_connections(self):
+        """How many threads currently hold an open connection."""
+        with self._lock:
+            return sum(holder.close.alive for holder in self._holders)
@@ -0,0 +1,82 @@
+# ledger.py - In-process account ledger used by payment_processor.withdraw
+#
+# Balances are integer cents, so there's no float rounding. Each account
+# has its own asyncio.Lock, held from the balance check to the debit, so two
+# withdrawals can't both pass the check. Withdrawals from different
+# accounts never wait on each other. Locks belong to the event loop that
+# created them, so each running loop gets its own set.
+
+import asyncio
+import weakref
+
+
+class InsufficientFunds(Exception):
+    pass
+
+
+class Ledger:
+    def __init__(self):
+        self._balances = {}  # account_id -> balance in cents
+        # event loop -> {account_id: asyncio.Lock}
+        self._locks = weakref.WeakKeyDictionary()
+
+    def open_account(self, account_id, balance_cents=0):
+        if account_id in self._balances:
+            raise ValueError(f"Account {account_id!r} already exists")
+        _check_cents(balance_cents, minimum=0)
+        self._balances[account_id] = balance_cents
+
+    def balance(self, account_id):
+        return self._balances[account_id]
+
+    def _lock(self, account_id):
+        if account_id not in self._balances:
+            raise KeyError(account_id)
+        # No await between the lookup and the insert, so this can't race.
+        locks = self._locks.setdefault(asyncio.get_running_loop(), {})
+        lock = locks.get(account_id)
+        if lock is None:
+            lock = locks[account_id] = asyncio.Lock()
+        return lock
+
+    async def deposit(self, account_id, amount_cents):
+        _check_cents(amount_cents)
+        async with self._lock(account_id):
+            self._balances[account_id] += amount_cents
+            return self._balances[account_id]
+
+    async def withdraw(self, account_id, amount_cents, authorize=None):
+        """Debit amount_cents if the balance covers it, and return the new balance.
+
+        authorize, if given, is a coroutine function (e.g. a call to a payment
+        provider) awaited after the balance check and before the debit, while
+        the account is still locked. Raises InsufficientFunds if the balance is
+        too low; nothing is debited if authorize raises.
+        """
+        _check_cents(amount_cents)
+        async with self._lock(account_id):
+            if self._balances[account_id] < amount_cents:
+                raise InsufficientFunds(f"Account {account_id!r} can't cover {amount_cents} cents")
+            if authorize is not None:
+                await authorize()
+            self._balances[account_id] -= amount_cents
+            return self._balances[account_id]
+
+    async def transfer(self, source, target, amount_cents):
+        """Move amount_cents between accounts; both are locked for the duration."""
+        _check_cents(amount_cents)
+        if source == target:
+            raise ValueError("Can't transfer to the same account")
+        # Always lock in the same order so two opposite transfers can't deadlock.
+        first, second = sorted((source, target), key=repr)
+        async with self._lock(first), self._lock(second):
+            if self._balances[source] < amount_cents:
+                raise InsufficientFunds(f"Account {source!r} can't cover {amount_cents} cents")
+            self._balances[source] -= amount_cents
+            self._balances[target] += amount_cents
+
+
+def _check_cents(amount, minimum=1):
+    """Deposits, withdrawals and transfers must move at least one cent."""
+    if not isinstance(amount, int) or isinstance(amount, bool) or amount < minimum:
+        raise ValueError(f"Amount must be a whole number of cents, at least {minimum}, got {amount!r}")
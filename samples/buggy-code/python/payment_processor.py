@@ -3,9 +3,13 @@
 # Try: copilot --allow-all -p "Debug @samples/buggy-code/python/payment_processor.py"
 
 import os
-import sqlite3
 from decimal import Decimal
 
+from db import ConnectionPool
+from ledger import InsufficientFunds, Ledger
+from pricing import cart_total_cents, to_cents
+from receipts import ReceiptRepository
+
 # BUG 1: API key hardcoded (should be in env vars)
 STRIPE_API_KEY = "sk_test_4eC39HqLyjWDarjtT1zdp7dc"
 
@@ -22,12 +26,14 @@ def process_payment(amount, currency, card_token):
     return charge
 
 
-# BUG 3: Floating point arithmetic for money
+# (Formerly BUG 3: Floating point arithmetic for money - fixed)
+# Totals are summed in integer cents and returned as an exact Decimal number
+# of dollars instead of a float; use float() on the result if you really
+# need one. Each unit price is rounded half up to whole cents first, so
+# 3 x $0.333 is $0.99, not $0.999. A price that isn't a number raises
+# ValueError. To price many carts at once, use pricing.cart_totals().
 def calculate_total(items):
-    total = 0.0
-    for item in items:
-        total += item['price'] * item['quantity']
-    return total  # Will have floating point errors: 0.1 + 0.2 = 0.30000000000000004
+    return Decimal(cart_total_cents(items)) / 100
 
 
 # BUG 4: No error handling
@@ -41,18 +47,26 @@ def refund(charge_id, amount):
     return refund
 
 
-# BUG 5: Race condition in balance check
-account_balance = 1000.0
+# (Formerly BUG 5: Race condition in balance check - fixed)
+# Balances live in a Ledger (see ledger.py): integer cents, and each account
+# is locked from the balance check to the debit.
+DEFAULT_ACCOUNT = "default"
+ledger = Ledger()
+ledger.open_account(DEFAULT_ACCOUNT, 100000)
+
 
-async def withdraw(amount):
-    global account_balance
-    if account_balance >= amount:
-        # Another request could modify account_balance here
-        import asyncio
-        await asyncio.sleep(0.1)  # Simulate network delay
-        account_balance -= amount
-        return {"success": True, "new_balance": account_balance}
-    return {"success": False, "reason": "Insufficient funds"}
+async def withdraw(amount, account_id=DEFAULT_ACCOUNT):
+    import asyncio
+    cents = to_cents(amount)
+    if cents <= 0:
+        # Anything under half a cent rounds to nothing; don't report that as paid.
+        return {"success": False, "reason": "Amount must be at least one cent"}
+    try:
+        new_balance = await ledger.withdraw(
+            account_id, cents, authorize=lambda: asyncio.sleep(0.1))  # Simulate network delay
+    except InsufficientFunds:
+        return {"success": False, "reason": "Insufficient funds"}
+    return {"success": True, "new_balance": Decimal(new_balance) / 100}
 
 
 # BUG 6: Sensitive data in logs
@@ -61,12 +75,27 @@ def log_transaction(transaction):
     # This logs credit card numbers and CVVs!
 
 
-# BUG 7: SQL injection in receipt lookup
+# (Formerly BUG 7: SQL injection in receipt lookup - fixed)
+# Lookups are parameterized, indexed and share connections. See receipts.py.
+receipts = ReceiptRepository(ConnectionPool('payments.db'))
+
+
+def create_receipt_indexes():
+    """Run once when setting up payments.db; lookups never change the schema."""
+    receipts.ensure_indexes()
+
 def get_receipt(receipt_id):
-    conn = sqlite3.connect('payments.db')
-    cursor = conn.cursor()
-    cursor.execute(f"SELECT * FROM receipts WHERE id = '{receipt_id}'")
-    return cursor.fetchone()
+    return receipts.get(receipt_id)
+
+
+def get_receipts(receipt_ids):
+    """Fetch many receipts at once. Returns {id: row}."""
+    return receipts.get_many(receipt_ids)
+
+
+def iter_receipts(start, end):
+    """Stream receipts created in [start, end) for reconciliation."""
+    return receipts.iter_range(start, end)
 
 
 # BUG 8: Integer overflow risk / precision loss
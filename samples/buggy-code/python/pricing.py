@@ -0,0 +1,101 @@
+# pricing.py - Exact cart totals in integer cents, one cart or many at once
+#
+# cart_total_cents() prices one cart of {'price', 'quantity'} dicts.
+# cart_totals() prices a whole batch given as parallel columns (one entry per
+# line item) and gives the same result per cart. It uses NumPy for integer
+# cart ids when NumPy is installed and the totals fit in 64 bits, and plain
+# Python integers otherwise.
+
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+BACKENDS = ("auto", "numpy", "python")
+
+
+INT64_MAX = 2 ** 63 - 1
+
+
+def to_cents(price):
+    """Convert a dollar price (number or string) to whole cents, rounding half up.
+
+    Raises ValueError if price isn't a finite number.
+    """
+    try:
+        cents = (Decimal(str(price)) * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP)
+    except InvalidOperation:
+        cents = None
+    if cents is None or not cents.is_finite():
+        raise ValueError(f"Invalid price: {price!r}")
+    return int(cents)
+
+
+def cart_total_cents(items):
+    """Total of one cart of {'price': dollars, 'quantity': n} items, in cents."""
+    return sum(to_cents(item['price']) * item['quantity'] for item in items)
+
+
+def cart_totals(cart_ids, prices_cents, quantities, backend="auto"):
+    """Total every cart in a batch of line items. Returns {cart_id: total_cents}.
+
+    The three sequences hold one entry per line item: which cart it belongs
+    to, its unit price in integer cents and its quantity.
+    """
+    if not len(cart_ids) == len(prices_cents) == len(quantities):
+        raise ValueError("cart_ids, prices_cents and quantities must be the same length")
+    if backend == "auto":
+        backend = "numpy" if np is not None and np.asarray(cart_ids).dtype.kind in "iu" else "python"
+    if backend == "numpy":
+        if np is None:
+            raise ValueError("backend='numpy' needs NumPy installed")
+        return _totals_numpy(cart_ids, prices_cents, quantities)
+    if backend == "python":
+        return _totals_python(cart_ids, prices_cents, quantities)
+    raise ValueError(f"Unknown backend: {backend!r} (expected one of {', '.join(BACKENDS)})")
+
+
+def _totals_python(cart_ids, prices_cents, quantities):
+    totals = {}
+    get = totals.get
+    for cart, price, quantity in zip(cart_ids, prices_cents, quantities):
+        totals[cart] = get(cart, 0) + price * quantity
+    # A float anywhere in the input would have made its cart's total a float.
+    if not all(type(total) is int for total in totals.values()):
+        raise TypeError("prices_cents and quantities must be integers")
+    return totals
+
+
+def _totals_numpy(cart_ids, prices_cents, quantities):
+    if len(cart_ids) == 0:
+        return {}
+    carts = np.asarray(cart_ids)
+    if carts.dtype.kind not in "iu":
+        # NumPy would turn mixed ids such as [1, "1"] into strings, so the
+        # keys wouldn't match the Python backend's.
+        raise TypeError("backend='numpy' needs integer cart ids; use backend='python'")
+    prices = np.asarray(prices_cents)
+    counts = np.asarray(quantities)
+    if prices.dtype.kind == "O" or counts.dtype.kind == "O":
+        # Python ints too big for 64 bits; only the Python backend is exact.
+        return _totals_python(cart_ids, prices_cents, quantities)
+    if prices.dtype.kind not in "iu" or counts.dtype.kind not in "iu":
+        raise TypeError("prices_cents and quantities must be integers")
+    if _largest(prices) * _largest(counts) * len(prices) > INT64_MAX:
+        # A product or a cart total could overflow int64 without any error.
+        return _totals_python(cart_ids, prices.tolist(), counts.tolist())
+    amounts = prices.astype(np.int64) * counts.astype(np.int64)
+    # Sort line items by cart and sum each run; integer sums are exact
+    # (bincount would go through float64).
+    order = np.argsort(carts, kind="stable")
+    sorted_carts = carts[order]
+    starts = np.flatnonzero(np.concatenate(([True], sorted_carts[1:] != sorted_carts[:-1])))
+    totals = np.add.reduceat(amounts[order], starts)
+    return dict(zip(sorted_carts[starts].tolist(), totals.tolist()))
+
+
+def _largest(values):
+    """Largest absolute value in an integer array, as a Python int."""
+    return max(abs(int(values.min())), abs(int(values.max())))
@@ -0,0 +1,58 @@
+# receipts.py - Indexed, batched receipt lookups for payment_processor
+#
+# Reads go through a shared ConnectionPool (see db.py) with parameterized
+# queries and never change the schema. Call ensure_indexes() once when
+# setting up the database (payment_processor.create_receipt_indexes) so
+# looking up a receipt by id or a date range doesn't scan the whole table.
+
+CHUNK_SIZE = 500
+
+
+class ReceiptRepository:
+    def __init__(self, pool, date_column="created_at"):
+        self.pool = pool
+        self.date_column = date_column
+
+    def ensure_indexes(self):
+        """Index receipts by id and date.
+
+        The id index is skipped when id is the primary key (already indexed)
+        and the date index when the table has no date_column.
+        """
+        conn = self.pool.connection()
+        # Column name -> position in the primary key (0 if not part of it).
+        columns = {row[1]: row[5] for row in conn.execute("PRAGMA table_info(receipts)")}
+        if columns.get("id") != 1:
+            conn.execute("CREATE INDEX IF NOT EXISTS receipts_id ON receipts (id)")
+        if self.date_column in columns:
+            conn.execute(f"CREATE INDEX IF NOT EXISTS receipts_{self.date_column} "
+                         f"ON receipts ({self.date_column})")
+
+    def get(self, receipt_id):
+        return self.pool.query_one("SELECT * FROM receipts WHERE id = ?", (receipt_id,))
+
+    def get_many(self, receipt_ids, chunk_size=CHUNK_SIZE):
+        """Fetch many receipts by id. Returns {id: row}; missing ids are left out."""
+        conn = self.pool.connection()
+        ids = list(dict.fromkeys(receipt_ids))
+        receipts = {}
+        for start in range(0, len(ids), chunk_size):
+            chunk = ids[start:start + chunk_size]
+            placeholders = ",".join("?" * len(chunk))
+            for row in conn.execute(f"SELECT * FROM receipts WHERE id IN ({placeholders})", chunk):
+                receipts[row["id"]] = row
+        return receipts
+
+    def iter_range(self, start, end, batch_size=1000):
+        """Yield receipts with start <= date < end in date order, batch_size rows at a time."""
+        cursor = self.pool.connection().execute(
+            f"SELECT * FROM receipts WHERE {self.date_column} >= ? AND {self.date_column} < ? "
+            f"ORDER BY {self.date_column}", (start, end))
+        try:
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    return
+                yield from rows
+        finally:
+            cursor.close()
@@ -0,0 +1,77 @@
+import gc
+import os
+import sqlite3
+import sys
+import threading
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from db import ConnectionPool
+
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "test.db"))
+    pool.connection().execute("CREATE TABLE items (name TEXT)")
+    yield pool
+    pool.close_all()
+
+
+def in_thread(func):
+    result = []
+    thread = threading.Thread(target=lambda: result.append(func()))
+    thread.start()
+    thread.join()
+    return result[0]
+
+
+def test_each_thread_reuses_its_own_connection(pool):
+    main = pool.connection()
+    assert pool.connection() is main
+    other = in_thread(lambda: (pool.connection(), pool.connection()))
+    assert other[0] is other[1]
+    assert other[0] is not main
+
+
+def test_connections_close_when_their_threads_exit(pool):
+    connections = [in_thread(pool.connection) for _ in range(20)]
+    gc.collect()
+    assert pool.open_connections() == 1  # just the main thread's
+    with pytest.raises(sqlite3.ProgrammingError):
+        connections[0].execute("SELECT 1")
+
+
+def test_close_all_closes_every_connection_and_threads_reconnect(pool):
+    main = pool.connection()
+    release = threading.Event()
+    started = threading.Event()
+
+    def hold_connection():
+        pool.connection()
+        started.set()
+        release.wait(5)
+
+    thread = threading.Thread(target=hold_connection)
+    thread.start()
+    started.wait(5)
+    assert pool.open_connections() == 2
+    pool.close_all()
+    release.set()
+    thread.join()
+    assert pool.open_connections() == 0
+    with pytest.raises(sqlite3.ProgrammingError):
+        main.execute("SELECT 1")
+    assert pool.connection() is not main
+    assert pool.query_one("SELECT count(*) FROM items")[0] == 0
+
+
+def test_transaction_commits_or_rolls_back(pool):
+    with pool.transaction() as conn:
+        conn.execute("INSERT INTO items VALUES ('kept')")
+    with pytest.raises(RuntimeError):
+        with pool.transaction() as conn:
+            conn.execute("INSERT INTO items VALUES ('dropped')")
+            raise RuntimeError("boom")
+    assert [row["name"] for row in pool.query_all("SELECT name FROM items")] == ["kept"]
+    # Another thread's connection sees only the committed row.
+    assert in_thread(lambda: pool.query_one("SELECT count(*) FROM items")[0]) == 1
@@ -0,0 +1,45 @@
+import asyncio
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+import payment_processor
+from ledger import Ledger
+
+
+def test_withdraw_works_under_separate_event_loops(monkeypatch):
+    ledger = Ledger()
+    ledger.open_account("acct", 1000)
+    monkeypatch.setattr(payment_processor, "ledger", ledger)
+
+    async def two_at_once():
+        # Contending for the account's lock binds it to this loop.
+        return await asyncio.gather(payment_processor.withdraw(1, "acct"),
+                                    payment_processor.withdraw(2, "acct"))
+
+    assert all(r["success"] for r in asyncio.run(two_at_once()))
+    assert all(r["success"] for r in asyncio.run(two_at_once()))
+    assert ledger.balance("acct") == 400
+
+
+def test_withdraw_rounds_half_cents_up_and_rejects_zero(monkeypatch):
+    ledger = Ledger()
+    ledger.open_account("acct", 1000)
+    monkeypatch.setattr(payment_processor, "ledger", ledger)
+
+    assert asyncio.run(payment_processor.withdraw(0.005, "acct"))["success"]
+    assert ledger.balance("acct") == 999
+    for amount in (0.004, 0, -1):
+        result = asyncio.run(payment_processor.withdraw(amount, "acct"))
+        assert result == {"success": False, "reason": "Amount must be at least one cent"}
+    assert ledger.balance("acct") == 999
+
+
+def test_ledger_rejects_zero_cent_movements():
+    ledger = Ledger()
+    ledger.open_account("a", 0)
+    ledger.open_account("b", 100)
+    for call in (ledger.deposit("a", 0), ledger.withdraw("b", 0), ledger.transfer("b", "a", 0)):
+        with pytest.raises(ValueError):
+            asyncio.run(call)
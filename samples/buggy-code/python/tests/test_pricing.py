@@ -0,0 +1,71 @@
+import os
+import random
+import sys
+from decimal import Decimal
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+import pricing
+from payment_processor import calculate_total
+from pricing import cart_total_cents, cart_totals
+
+BACKENDS = [
+    "python",
+    pytest.param("numpy", marks=pytest.mark.skipif(pricing.np is None, reason="numpy not installed")),
+]
+
+
+def make_items(count, carts, seed=0):
+    rng = random.Random(seed)
+    return ([rng.randrange(carts) for _ in range(count)],
+            [rng.randint(1, 50_000) for _ in range(count)],
+            [rng.randint(1, 10) for _ in range(count)])
+
+
+def test_calculate_total_is_exact_decimal_dollars():
+    assert calculate_total([{"price": 0.1, "quantity": 1}, {"price": 0.2, "quantity": 1}]) == Decimal("0.3")
+    # Unit prices are charged in whole cents.
+    assert calculate_total([{"price": 0.333, "quantity": 3}]) == Decimal("0.99")
+    assert calculate_total([]) == 0
+
+
+def test_calculate_total_rejects_bad_prices_with_value_error():
+    for price in ("abc", None, float("nan"), float("inf")):
+        with pytest.raises(ValueError, match="Invalid price"):
+            calculate_total([{"price": price, "quantity": 1}])
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_batch_totals_match_one_cart_at_a_time(backend):
+    cart_ids, prices, quantities = make_items(5000, 300)
+    carts = {}
+    for cart, price, quantity in zip(cart_ids, prices, quantities):
+        carts.setdefault(cart, []).append({"price": f"{price // 100}.{price % 100:02d}", "quantity": quantity})
+    expected = {cart: cart_total_cents(items) for cart, items in carts.items()}
+    assert cart_totals(cart_ids, prices, quantities, backend=backend) == expected
+    assert cart_totals([], [], [], backend=backend) == {}
+
+
+def test_python_backend_stays_exact_and_keeps_id_types():
+    big = 2 ** 62
+    assert cart_totals([1, "1", 1], [big, 5, big], [4, 1, 4], backend="python") == {1: 8 * big, "1": 5}
+    with pytest.raises(TypeError):
+        cart_totals([1], [1.5], [1], backend="python")
+    with pytest.raises(ValueError):
+        cart_totals([1, 2], [1], [1], backend="python")
+
+
+@pytest.mark.skipif(pricing.np is None, reason="numpy not installed")
+def test_numpy_backend_rejects_mixed_ids_and_avoids_overflow():
+    np = pricing.np
+    with pytest.raises(TypeError, match="integer cart ids"):
+        cart_totals([1, "1"], [5, 5], [1, 1], backend="numpy")
+    # Auto falls back to Python for ids NumPy can't keep as they are.
+    assert cart_totals([1, "1"], [5, 6], [1, 1]) == {1: 5, "1": 6}
+
+    big = 2 ** 62
+    expected = {1: 8 * big}
+    assert cart_totals([1, 1], [big, big], [4, 4], backend="numpy") == expected
+    assert cart_totals(np.array([1, 1]), np.array([big, big], dtype=np.int64),
+                       np.array([4, 4], dtype=np.int64), backend="numpy") == expected
+    assert cart_totals([1], [2 ** 70], [1], backend="numpy") == {1: 2 ** 70}
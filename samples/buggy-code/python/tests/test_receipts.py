@@ -0,0 +1,63 @@
+import os
+import sqlite3
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db import ConnectionPool
+from receipts import ReceiptRepository
+
+
+def make_db(path, schema):
+    conn = sqlite3.connect(path)
+    conn.execute(schema)
+    conn.executemany("INSERT INTO receipts (id, created_at) VALUES (?, ?)",
+                     [("r1", "2024-01-05"), ("r2", "2024-02-05"), ("r3", "2024-01-20")])
+    conn.commit()
+    conn.close()
+
+
+def indexes(path):
+    conn = sqlite3.connect(path)
+    try:
+        return sorted(name for (name,) in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND name NOT LIKE 'sqlite_%'"))
+    finally:
+        conn.close()
+
+
+def test_lookups_do_not_change_the_schema(tmp_path):
+    path = str(tmp_path / "payments.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE receipts (id TEXT, amount_cents INTEGER)")
+    conn.execute("INSERT INTO receipts VALUES ('r1', 100)")
+    conn.commit()
+    conn.close()
+    repo = ReceiptRepository(ConnectionPool(path))
+
+    assert repo.get("r1")["amount_cents"] == 100
+    assert list(repo.get_many(["r1", "nope"])) == ["r1"]
+    assert indexes(path) == []
+    repo.ensure_indexes()
+    assert indexes(path) == ["receipts_id"]
+
+
+def test_ensure_indexes_skips_a_primary_key_id(tmp_path):
+    path = str(tmp_path / "payments.db")
+    make_db(path, "CREATE TABLE receipts (id TEXT PRIMARY KEY, created_at TEXT)")
+    ReceiptRepository(ConnectionPool(path)).ensure_indexes()
+    assert indexes(path) == ["receipts_created_at"]
+
+
+def test_iter_range_reads_without_creating_indexes(tmp_path):
+    path = str(tmp_path / "payments.db")
+    make_db(path, "CREATE TABLE receipts (id TEXT, created_at TEXT)")
+    pool = ConnectionPool(path)
+    pool.connection().execute("PRAGMA query_only = ON")
+    read_only = ReceiptRepository(pool)
+    assert [r["id"] for r in read_only.iter_range("2024-01-01", "2024-02-01")] == ["r1", "r3"]
+    assert indexes(path) == []
+
+    repo = ReceiptRepository(ConnectionPool(path))
+    repo.ensure_indexes()
+    assert indexes(path) == ["receipts_created_at", "receipts_id"]
+    assert [r["id"] for r in repo.iter_range("2024-01-01", "2024-02-01")] == ["r1", "r3"]
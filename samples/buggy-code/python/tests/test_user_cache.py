@@ -0,0 +1,136 @@
+import os
+import sys
+import threading
+import time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from user_cache import UserCache
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.001)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_concurrent_misses_share_one_load():
+    cache = UserCache()
+    calls = []
+    release = threading.Event()
+
+    def loader(key):
+        calls.append(key)
+        release.wait(5)
+        return f"user {key}"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get(1, loader))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    wait_until(lambda: cache.stats().misses == len(threads))
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert calls == [1]
+    assert results == ["user 1"] * 8
+
+
+def test_entries_expire_after_ttl():
+    clock = FakeClock()
+    cache = UserCache(ttl=10, clock=clock)
+    assert cache.get(1, lambda key: "old") == "old"
+    clock.now = 9.9
+    assert cache.get(1, lambda key: "new") == "old"
+    clock.now = 10
+    assert cache.get(1, lambda key: "new") == "new"
+    stats = cache.stats()
+    assert (stats.hits, stats.misses, stats.expirations) == (1, 2, 1)
+
+
+def test_least_recently_used_entries_are_evicted_first():
+    cache = UserCache(maxsize=2)
+    cache.get(1, str)
+    cache.get(2, str)
+    cache.get(1, str)  # 2 is now the least recently used
+    cache.get(3, str)
+    assert len(cache) == 2
+    assert cache.stats().evictions == 1
+    loaded = []
+    cache.get(2, lambda key: loaded.append(key) or str(key))
+    cache.get(3, lambda key: loaded.append(key) or str(key))
+    assert loaded == [2]
+    assert cache.stats().evictions == 2  # loading 2 again evicted 1
+
+
+def test_invalidate_during_load_keeps_the_result_out_of_the_cache():
+    cache = UserCache()
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow_loader(key):
+        started.set()
+        release.wait(5)
+        return "stale"
+
+    results = []
+    thread = threading.Thread(target=lambda: results.append(cache.get(1, slow_loader)))
+    thread.start()
+    started.wait(5)
+    cache.invalidate(1)
+    release.set()
+    thread.join()
+    assert results == ["stale"]
+    assert len(cache) == 0
+    assert cache.get(1, lambda key: "fresh") == "fresh"
+
+
+def test_loader_errors_reach_every_waiter_and_are_not_cached():
+    cache = UserCache()
+    release = threading.Event()
+
+    def failing_loader(key):
+        release.wait(5)
+        raise LookupError("database down")
+
+    errors = []
+
+    def lookup():
+        try:
+            cache.get(1, failing_loader)
+        except LookupError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=lookup) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    wait_until(lambda: cache.stats().misses == len(threads))
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert len(errors) == 4
+    assert cache.stats().load_errors == 1
+    assert len(cache) == 0
+    assert cache.get(1, lambda key: "back") == "back"
+
+
+def test_cache_none_false_does_not_store_missing_keys():
+    users = {}
+    cache = UserCache(cache_none=False)
+    assert cache.get(1, users.get) is None
+    users[1] = "alice"
+    assert cache.get(1, users.get) == "alice"
+
+
+def test_maxsize_must_be_positive():
+    with pytest.raises(ValueError):
+        UserCache(maxsize=0)
@@ -0,0 +1,71 @@
+import os
+import sqlite3
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+import user_service
+from db import ConnectionPool
+from user_cache import UserCache
+
+
+@pytest.fixture(autouse=True)
+def users_db(tmp_path, monkeypatch):
+    """Point user_service at a fresh users table and an empty cache."""
+    path = str(tmp_path / "users.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT NOT NULL, "
+                 "email TEXT UNIQUE, password TEXT)")
+    conn.close()
+    pool = ConnectionPool(path)
+    monkeypatch.setattr(user_service, "db", pool)
+    monkeypatch.setattr(user_service, "user_cache", UserCache(cache_none=False))
+    yield path
+    pool.close_all()
+
+
+def make_users(count, start=0):
+    return [{"name": f"User {i}", "email": f"user{i}@example.com", "password": "pw"}
+            for i in range(start, start + count)]
+
+
+def names():
+    return [row["name"] for row in user_service.db.query_all("SELECT name FROM users ORDER BY id")]
+
+
+def test_create_users_across_chunk_boundaries():
+    assert user_service.create_users(make_users(5), chunk_size=2) == 5
+    assert names() == [f"User {i}" for i in range(5)]
+
+
+def test_bulk_update_and_delete_return_row_counts():
+    user_service.create_users(make_users(5), chunk_size=2)
+    renamed = {1: {"name": "One"}, 2: {"name": "Two"}, 3: {"name": "Three"}, 99: {"name": "Nobody"}}
+    assert user_service.update_users(renamed, chunk_size=2) == 3
+    assert user_service.update_users([(4, {"name": "Four"})], chunk_size=2) == 1
+    assert user_service.delete_users([1, 5, 99, 98, 97], chunk_size=2) == 2
+    assert names() == ["Two", "Three", "Four"]
+
+
+def test_bulk_update_and_delete_invalidate_the_cache():
+    user_service.create_users(make_users(3))
+    assert user_service.get_cached_user(1)["name"] == "User 0"
+    assert user_service.get_cached_user(2)["name"] == "User 1"
+    user_service.update_users({1: {"name": "Renamed"}})
+    user_service.delete_users([2])
+    assert user_service.get_cached_user(1)["name"] == "Renamed"
+    assert user_service.get_cached_user(2) is None
+
+
+def test_get_users_skips_missing_and_duplicate_ids():
+    user_service.create_users(make_users(5))
+    users = user_service.get_users([3, 1, 3, 42, 1, 5], chunk_size=2)
+    assert sorted(users) == [1, 3, 5]
+    assert users[3]["name"] == "User 2"
+
+
+def test_earlier_chunks_stay_committed_when_a_later_one_fails():
+    rows = make_users(3) + make_users(1) + make_users(1, start=3)  # row 4 repeats user0's email
+    with pytest.raises(sqlite3.IntegrityError):
+        user_service.create_users(rows, chunk_size=2)
+    assert names() == ["User 0", "User 1"]
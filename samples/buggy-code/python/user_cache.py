@@ -0,0 +1,121 @@
+# user_cache.py - Thread-safe cache used by user_service.get_cached_user
+#
+# Bounded by size (least recently used entries are evicted first) and by age
+# (entries expire after ttl seconds). Concurrent misses for the same key share
+# one load instead of all hitting the database at once. With cache_none=False
+# a load that finds nothing is not stored, so a key created later is seen on
+# the next lookup instead of after the ttl.
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+    invalidations: int = 0
+    load_errors: int = 0
+
+
+class _Load:
+    """A load in progress that other callers wait on instead of starting their own."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+        # Set when the key is invalidated mid-load, so the result isn't stored.
+        self.stale = False
+
+
+class UserCache:
+    def __init__(self, maxsize=1024, ttl=60.0, clock=time.monotonic, cache_none=True):
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.cache_none = cache_none
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (expires_at, value), oldest first
+        self._loads = {}  # key -> _Load
+        self._stats = CacheStats()
+
+    def get(self, key, loader):
+        """Return the cached value for key, calling loader(key) at most once per miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > self._clock():
+                    self._entries.move_to_end(key)
+                    self._stats.hits += 1
+                    return entry[1]
+                del self._entries[key]
+                self._stats.expirations += 1
+            self._stats.misses += 1
+            load = self._loads.get(key)
+            owner = load is None
+            if owner:
+                load = self._loads[key] = _Load()
+
+        if not owner:
+            load.done.wait()
+            if load.error is not None:
+                raise load.error
+            return load.value
+
+        try:
+            load.value = loader(key)
+        except BaseException as e:
+            load.error = e
+            with self._lock:
+                self._stats.load_errors += 1
+                if self._loads.get(key) is load:
+                    del self._loads[key]
+            raise
+        finally:
+            load.done.set()
+
+        with self._lock:
+            if self._loads.get(key) is load:
+                del self._loads[key]
+            if not load.stale and (load.value is not None or self.cache_none):
+                self._store(key, load.value)
+        return load.value
+
+    def _store(self, key, value):
+        self._entries[key] = (self._clock() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self._stats.evictions += 1
+
+    def invalidate(self, key):
+        """Drop key, including any load of it still in progress."""
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self._stats.invalidations += 1
+            load = self._loads.pop(key, None)
+            if load is not None:
+                load.stale = True
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            for load in self._loads.values():
+                load.stale = True
+            self._loads.clear()
+
+    def stats(self):
+        """A copy of the hit/miss/eviction counters."""
+        with self._lock:
+            return CacheStats(**vars(self._stats))
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
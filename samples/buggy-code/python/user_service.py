@@ -5,35 +5,41 @@
 #   copilot --allow-all -p "Review @samples/buggy-code/python/user_service.py for security issues"
 #   copilot --allow-all -p "Find all bugs in @samples/buggy-code/python/user_service.py"
 
-import sqlite3
 import hashlib
 
-# BUG 1: SQL Injection
-# The user_id is directly interpolated into the query string
+from db import ConnectionPool
+from user_cache import UserCache
+
+DB_PATH = 'users.db'
+db = ConnectionPool(DB_PATH)
+
+# (Formerly BUG 1: SQL Injection - fixed)
+# Queries are parameterized and run on a shared per-thread connection. See db.py.
 def get_user(user_id):
-    conn = sqlite3.connect('users.db')
-    cursor = conn.cursor()
-    cursor.execute(f"SELECT * FROM users WHERE id = {user_id}")
-    return cursor.fetchone()
+    return db.query_one("SELECT * FROM users WHERE id = ?", (user_id,))
 
 
-# BUG 2: Race Condition
-# Multiple requests can trigger parallel database calls before cache is set
-user_cache = {}
+# (Formerly BUG 2: Race Condition - fixed)
+# The cache is bounded, entries expire, concurrent misses share one query,
+# and update_user/delete_user invalidate it. Unknown ids aren't cached, so a
+# user created afterwards is found right away. See user_cache.py.
+user_cache = UserCache(maxsize=1024, ttl=60.0, cache_none=False)
 
 def get_cached_user(user_id):
-    if user_id not in user_cache:
-        user_cache[user_id] = get_user(user_id)
-    return user_cache[user_id]
+    return user_cache.get(user_id, get_user)
+
+
+def cache_stats():
+    """Hit/miss/eviction counters for get_cached_user."""
+    return user_cache.stats()
 
 
-# BUG 3: SQL Injection + No Error Handling
-# String interpolation in SQL and no try/except
+# BUG 3: No Error Handling
+# A missing 'name' key or an unknown user_id isn't checked for
 def update_user(user_id, data):
-    conn = sqlite3.connect('users.db')
-    cursor = conn.cursor()
-    cursor.execute(f"UPDATE users SET name = '{data['name']}' WHERE id = {user_id}")
-    conn.commit()
+    with db.transaction() as conn:
+        conn.execute("UPDATE users SET name = ? WHERE id = ?", (data['name'], user_id))
+    user_cache.invalidate(user_id)
     return get_user(user_id)
 
 
@@ -41,10 +47,7 @@ def update_user(user_id, data):
 # Password is logged in plain text
 def login(email, password):
     print(f"Login attempt: {email} / {password}")
-    conn = sqlite3.connect('users.db')
-    cursor = conn.cursor()
-    cursor.execute(f"SELECT * FROM users WHERE email = '{email}'")
-    user = cursor.fetchone()
+    user = db.query_one("SELECT * FROM users WHERE email = ?", (email,))
     if user and user['password'] == password:
         return {"success": True, "user": user}
     return {"success": False}
@@ -59,11 +62,9 @@ def verify_password(input_password, stored_password):
 # BUG 6: No Input Validation
 # Directly using user input without any validation
 def create_user(user_data):
-    conn = sqlite3.connect('users.db')
-    cursor = conn.cursor()
-    query = f"INSERT INTO users (name, email, password) VALUES ('{user_data['name']}', '{user_data['email']}', '{user_data['password']}')"
-    cursor.execute(query)
-    conn.commit()
+    with db.transaction() as conn:
+        conn.execute("INSERT INTO users (name, email, password) VALUES (?, ?, ?)",
+                     (user_data['name'], user_data['email'], user_data['password']))
 
 
 # BUG 7: Hardcoded Secret
@@ -78,10 +79,74 @@ def generate_token(user_id):
 # BUG 8: Missing Authentication Check
 # This function should verify the user is authorized to delete
 def delete_user(user_id):
-    conn = sqlite3.connect('users.db')
-    cursor = conn.cursor()
-    cursor.execute(f"DELETE FROM users WHERE id = {user_id}")
-    conn.commit()
+    with db.transaction() as conn:
+        conn.execute("DELETE FROM users WHERE id = ?", (user_id,))
+    user_cache.invalidate(user_id)
+
+
+# Bulk operations for syncs: executemany with one transaction per chunk of
+# chunk_size rows. chunk_size also bounds the number of ? placeholders in
+# get_users' IN (...) list.
+CHUNK_SIZE = 500
+
+
+def _chunks(items, size):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def create_users(users, chunk_size=CHUNK_SIZE):
+    """Insert many user dicts. Returns how many were inserted."""
+    created = 0
+    for chunk in _chunks(users, chunk_size):
+        with db.transaction() as conn:
+            conn.executemany("INSERT INTO users (name, email, password) VALUES (?, ?, ?)",
+                             [(u['name'], u['email'], u['password']) for u in chunk])
+        created += len(chunk)
+    return created
+
+
+def update_users(updates, chunk_size=CHUNK_SIZE):
+    """Rename many users from a {user_id: data} dict or (user_id, data) pairs. Returns rows changed."""
+    if isinstance(updates, dict):
+        updates = updates.items()
+    changed = 0
+    for chunk in _chunks(updates, chunk_size):
+        with db.transaction() as conn:
+            cursor = conn.executemany("UPDATE users SET name = ? WHERE id = ?",
+                                      [(data['name'], user_id) for user_id, data in chunk])
+        changed += cursor.rowcount
+        for user_id, _ in chunk:
+            user_cache.invalidate(user_id)
+    return changed
+
+
+def delete_users(user_ids, chunk_size=CHUNK_SIZE):
+    """Delete many users by id. Returns rows deleted."""
+    deleted = 0
+    for chunk in _chunks(user_ids, chunk_size):
+        with db.transaction() as conn:
+            cursor = conn.executemany("DELETE FROM users WHERE id = ?", [(user_id,) for user_id in chunk])
+        deleted += cursor.rowcount
+        for user_id in chunk:
+            user_cache.invalidate(user_id)
+    return deleted
+
+
+def get_users(user_ids, chunk_size=CHUNK_SIZE):
+    """Fetch many users by id. Returns {user_id: row}; missing ids are left out."""
+    users = {}
+    for chunk in _chunks(dict.fromkeys(user_ids), chunk_size):
+        placeholders = ",".join("?" * len(chunk))
+        for row in db.query_all(f"SELECT * FROM users WHERE id IN ({placeholders})", chunk):
+            users[row['id']] = row
+    return users
 
 
 # BUG 9: Weak Hashing (Python-specific)